@@ -0,0 +1,328 @@
+"""Headless benchmark of the diagnosis hot paths.
+
+Every stage runs against synthetic workloads derived from Training.csv and
+Testing.csv with a fixed seed, so two runs on the same machine measure the same
+work.  For each stage the harness reports p50/p99 latency per call, throughput
+and the peak Python/NumPy memory allocated (via tracemalloc, in a separate
+untimed pass so tracing does not distort the timings).
+
+Run ``python benchmark.py --output bench.json`` to write the results as JSON,
+and ``python benchmark.py --baseline bench.json`` on a later commit to print
+the change per stage and flag slowdowns.  ``python benchmark.py --vocabulary
+132,1000,10000`` instead shows how training memory, fit and prediction time
+change as the symptom vocabulary grows.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+DEFAULT_SEED = 0
+
+# Slowdown in p50 latency against the baseline that counts as a regression
+REGRESSION_THRESHOLD = 1.25
+
+# Run in a fresh interpreter by the cold_start stage: every import plus the load
+COLD_START = "from diagnosis_engine import DiagnosisEngine; DiagnosisEngine.load()"
+
+
+def partial_symptom_lists(training_data, rng, count, max_symptoms=5):
+    """Random training rows reduced to 1..max_symptoms of their symptoms"""
+    from differential import partial_samples
+    from sparse_symptoms import row_positives
+
+    rows = rng.integers(0, len(training_data), size=count)
+    X, _ = partial_samples(training_data.symptoms[np.sort(rows)],
+                           training_data.labels[np.sort(rows)], rng, max_symptoms)
+    columns = training_data.columns
+    return [[columns[idx] for idx in row_positives(X, row)] for row in range(X.shape[0])]
+
+
+def misspelled_queries(symptoms, rng, count):
+    """Symptom names typed as free text with one random typo"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    queries = []
+    for name in rng.choice(symptoms, size=count):
+        text = list(name.replace('_', ' ').strip())
+        pos = int(rng.integers(0, len(text)))
+        edit = rng.integers(0, 3)
+        if edit == 0 and len(text) > 3:
+            del text[pos]
+        elif edit == 1:
+            text[pos] = letters[rng.integers(0, 26)]
+        else:
+            text.insert(pos, letters[rng.integers(0, 26)])
+        queries.append(''.join(text))
+    return queries
+
+
+def prefixes(symptoms, rng, count):
+    """Type-ahead prefixes of 1..6 characters of symptom names"""
+    return [name.replace('_', ' ')[:int(rng.integers(1, 7))] for name in rng.choice(symptoms, size=count)]
+
+
+def test_cases(test_csv='Testing.csv'):
+    """(set of present symptoms, disease) per row of Testing.csv"""
+    import csv
+
+    with open(test_csv, newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        return [({name for name, val in zip(header[:-1], row[:-1]) if val == '1'}, row[-1])
+                for row in reader if row]
+
+
+def measure(func, inputs):
+    """Time func over every input; return latency percentiles, throughput and peak memory"""
+    timings = np.empty(len(inputs))
+    clock = time.perf_counter
+    for i, item in enumerate(inputs):
+        start = clock()
+        func(item)
+        timings[i] = clock() - start
+
+    tracemalloc.start()
+    for item in inputs[:min(len(inputs), 100)]:
+        func(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "calls": len(inputs),
+        "p50_ms": float(np.percentile(timings, 50)) * 1e3,
+        "p99_ms": float(np.percentile(timings, 99)) * 1e3,
+        "mean_ms": float(timings.mean()) * 1e3,
+        "throughput_per_s": len(inputs) / float(timings.sum()) if timings.sum() else float('inf'),
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def stages(seed=DEFAULT_SEED, scale=1.0):
+    """Yield (name, function, inputs) for every benchmarked stage"""
+    import pandas as pd
+    from diagnosis_engine import DiagnosisEngine
+    from differential import DEFAULT_TOP_K
+    from model_artifact import TRAINING_CSV, build_artifact, load_or_build
+    from model_backends import make_backend
+    from training_data import load_or_convert
+
+    n = max(10, int(2000 * scale))
+    rng = np.random.default_rng(seed)
+
+    # Start-up: CSV parsing versus the memory-mapped copy, model fit and load
+    yield "csv_load", lambda _: pd.read_csv(TRAINING_CSV), range(3)
+    yield "binary_load", lambda _: load_or_convert(TRAINING_CSV), range(20)
+    training_data = load_or_convert(TRAINING_CSV)
+    X = training_data.symptoms
+    y = training_data.labels.astype(np.intp)
+    n_classes = len(training_data.label_names)
+    # Warm up, so the first fit is not charged for importing scikit-learn
+    make_backend('tree', n_classes).fit(X, y)
+    yield "fit", lambda _: make_backend('tree', n_classes).fit(X, y), range(5)
+    yield "artifact_build", lambda _: build_artifact(), range(1)
+    artifact = load_or_build()
+    yield "engine_load", lambda _: DiagnosisEngine(artifact), range(3)
+    # What a new process pays before its first diagnosis, imports included
+    yield "cold_start", lambda _: subprocess.run([sys.executable, '-c', COLD_START], check=True), range(3)
+
+    engine = DiagnosisEngine(artifact, cache_size=0)
+    cached_engine = DiagnosisEngine(artifact)
+    profile_engine = DiagnosisEngine(artifact, cache_size=0, method='profile')
+    symptom_lists = partial_symptom_lists(training_data, rng, n)
+
+    # Per-request scoring
+    yield "encode", engine.vocabulary.encode, symptom_lists
+    yield "predict", engine.backend.predict_indices, [engine.vocabulary.encode(symptoms)
+                                                      for symptoms in symptom_lists]
+    yield "analyze", engine.analyze, symptom_lists
+    for symptoms in symptom_lists:
+        cached_engine.analyze(symptoms)
+    yield "analyze_cached", cached_engine.analyze, symptom_lists
+    yield "analyze_profile", profile_engine.analyze, symptom_lists
+    yield "analyze_differential", lambda symptoms: engine.analyze(symptoms, DEFAULT_TOP_K), symptom_lists
+    batches = [symptom_lists[i:i + 100] for i in range(0, len(symptom_lists), 100)]
+    yield "analyze_many_100", engine.analyze_many, batches
+
+    # Symptom entry
+    names = engine.all_symptoms
+    yield "fuzzy_match", engine.matcher.match, misspelled_queries(names, rng, n)
+    yield "complete", engine.completer.complete, prefixes(names, rng, n)
+
+    # Question-and-answer walks over every Testing.csv case
+    cases = test_cases() * max(1, int(10 * scale))
+
+    def tree_walk(case):
+        present, _ = case
+        node = 0
+        while engine.question(node) is not None:
+            node = engine.next_node(node, engine.question(node) in present)
+        return engine.leaf_disease(node)
+
+    def adaptive_walk(case):
+        present, _ = case
+        session = engine.questioner.start()
+        while session.question() is not None:
+            session.answer(session.question() in present)
+        return session.disease()
+
+    yield "qa_tree_walk", tree_walk, cases
+    yield "qa_adaptive_walk", adaptive_walk, cases
+
+
+def vocabulary_scaling(widths, seed=DEFAULT_SEED, scale=1.0, extra_per_row=2):
+    """Fit and predict cost of the tree backend as the symptom vocabulary grows
+
+    Training.csv is widened to each width with synthetic rare findings, each
+    training row getting ``extra_per_row`` of them, so the number of positives
+    per row stays about the same while the vocabulary grows.  Returns one row
+    of measurements per width.
+    """
+    from scipy import sparse
+    from model_backends import make_backend
+    from sparse_symptoms import row_positives
+    from training_data import load_or_convert
+
+    training_data = load_or_convert()
+    base = training_data.symptoms
+    y = training_data.labels.astype(np.intp)
+    n_classes = len(training_data.label_names)
+    n = max(10, int(2000 * scale))
+    # Warm up, so the first width is not charged for importing scikit-learn
+    make_backend('tree', n_classes).fit(base, y)
+    rows = []
+    for width in widths:
+        rng = np.random.default_rng(seed)
+        extra = width - base.shape[1]
+        if extra > 0:
+            X_extra = sparse.csr_matrix(
+                (np.ones(base.shape[0] * extra_per_row, dtype=np.uint8),
+                 rng.integers(0, extra, size=base.shape[0] * extra_per_row, dtype=np.int32),
+                 np.arange(0, base.shape[0] * extra_per_row + 1, extra_per_row)),
+                shape=(base.shape[0], extra))
+            X_extra.sum_duplicates()
+            X_extra.data[:] = 1
+            X = sparse.hstack([base, X_extra], format='csr')
+        else:
+            X = base
+        start = time.perf_counter()
+        backend = make_backend('tree', n_classes).fit(X, y)
+        fit_seconds = time.perf_counter() - start
+
+        queries = [tuple(row_positives(X, row).tolist()) for row in rng.integers(0, X.shape[0], size=n)]
+        predict = measure(backend.predict_indices, queries)
+        batch = X[rng.integers(0, X.shape[0], size=n)]
+        predict_batch = measure(lambda _: backend.predict(batch), range(5))
+        rows.append({
+            "vocabulary": X.shape[1],
+            "positives_per_row": X.nnz / X.shape[0],
+            "csr_kb": (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 1024,
+            "dense_kb": X.shape[0] * X.shape[1] / 1024,
+            "fit_s": fit_seconds,
+            "predict_p50_ms": predict["p50_ms"],
+            "predict_row_us": predict_batch["p50_ms"] * 1000 / batch.shape[0],
+        })
+        print(f"  vocabulary {X.shape[1]} done", file=sys.stderr)
+    return rows
+
+
+def report_scaling(rows):
+    print(f"{'vocabulary':>10}{'pos/row':>9}{'CSR KB':>10}{'dense KB':>10}{'fit s':>8}"
+          f"{'predict ms':>12}{'batch us/row':>14}")
+    for row in rows:
+        print(f"{row['vocabulary']:>10}{row['positives_per_row']:>9.1f}{row['csr_kb']:>10.0f}"
+              f"{row['dense_kb']:>10.0f}{row['fit_s']:>8.2f}{row['predict_p50_ms']:>12.4f}"
+              f"{row['predict_row_us']:>14.2f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(seed=DEFAULT_SEED, scale=1.0, only=None):
+    """Run the benchmark and return the results dictionary"""
+    results = {}
+    for name, func, inputs in stages(seed, scale):
+        if only and name not in only:
+            continue
+        results[name] = measure(func, list(inputs))
+        print(f"  {name:<22}{results[name]['p50_ms']:>10.3f} ms p50", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "scale": scale,
+        "stages": results,
+    }
+
+
+def report(results, baseline=None, threshold=REGRESSION_THRESHOLD):
+    """Print a table of the results, with the p50 ratio against a baseline"""
+    print(f"{'stage':<22}{'p50 ms':>10}{'p99 ms':>10}{'per s':>12}{'peak KB':>10}"
+          + (f"{'vs base':>10}" if baseline else ""))
+    regressions = []
+    for name, stats in results["stages"].items():
+        line = (f"{name:<22}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+                f"{stats['throughput_per_s']:>12.0f}{stats['peak_memory_kb']:>10.0f}")
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base and base["p50_ms"]:
+            ratio = stats["p50_ms"] / base["p50_ms"]
+            line += f"{ratio:>9.2f}x"
+            if ratio > threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the diagnosis hot paths")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--scale', type=float, default=1.0, help="workload size multiplier")
+    parser.add_argument('--stages', help="comma-separated stages to run (default: all)")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a previous JSON results file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="p50 slowdown against the baseline reported as a regression")
+    parser.add_argument('--metrics', help="also record stage metrics and write them to this "
+                                          "file in the Prometheus text format")
+    parser.add_argument('--vocabulary', help="instead of the stages, measure the tree backend at these "
+                                             "comma-separated vocabulary sizes, e.g. 132,1000,10000")
+    args = parser.parse_args()
+
+    if args.vocabulary:
+        rows = vocabulary_scaling([int(width) for width in args.vocabulary.split(',')], args.seed, args.scale)
+        report_scaling(rows)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump({"commit": git_commit(), "vocabulary_scaling": rows}, file, indent=2)
+        sys.exit(0)
+
+    if args.metrics:
+        from metrics import METRICS
+        METRICS.enabled = True
+
+    results = run(args.seed, args.scale, args.stages.split(',') if args.stages else None)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressions = report(results, baseline, args.threshold)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.metrics:
+        with open(args.metrics, 'w') as file:
+            file.write(METRICS.prometheus())
+    sys.exit(1 if regressions else 0)
@@ -1,14 +1,18 @@
+import time
+_START = time.perf_counter()
+
+import sys
 from tkinter import *
 from tkinter import ttk, messagebox, scrolledtext
-import os
 import webbrowser
-import numpy as np
-import pandas as pd
-from PIL import Image, ImageTk
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.tree import DecisionTreeClassifier, _tree
-from difflib import get_close_matches
+from concurrent.futures import ThreadPoolExecutor
+from metrics import METRICS
+from session_manager import SessionManager
+from user_store import AUTH_BAD_PASSWORD, AUTH_OK, UserStore
+
+# NumPy, SciPy (via the model artifact; scikit-learn and pandas only when it
+# is rebuilt) and PIL are imported lazily: the engine loads on a worker
+# thread while the main page is shown
 
 # Modern color scheme
 PRIMARY = "#2B5876"
@@ -21,6 +25,44 @@ SUCCESS = "#48BB78"
 WARNING = "#ED8936"
 ERROR = "#F56565"
 
+# Delay after the last keystroke before refreshing symptom suggestions
+SUGGEST_DELAY_MS = 150
+
+# How often the event loop checks for a finished background analysis
+ANALYSIS_POLL_MS = 50
+
+# Stage timings appended to the status bar in debug mode (DIAGNOSIS_DEBUG=1)
+DEBUG_STAGES = ('match', 'encode', 'cache_lookup', 'predict', 'result', 'render')
+
+# How often a page waiting for the diagnosis engine checks whether it has loaded
+ENGINE_POLL_MS = 100
+
+# How often the doctor directory files are checked for changes
+DOCTOR_REFRESH_MS = 30000
+
+# How often the delta store is checked for newly confirmed cases
+MODEL_REFRESH_MS = 5000
+
+# (phase, seconds since launch), filled in as the app starts
+STARTUP_PROFILE = []
+
+
+def load_engine():
+    """Import the diagnosis stack and load the model, with every stored case
+    folded in (runs on a worker thread); returns its ModelUpdater"""
+    from model_updates import load_updater
+    return load_updater()
+
+
+def profile_startup(phase):
+    """Record the time since launch at which a start-up phase finished"""
+    elapsed = time.perf_counter() - _START
+    STARTUP_PROFILE.append((phase, elapsed))
+    if METRICS.enabled:
+        METRICS.observe(f"startup_{phase}", elapsed)
+    if '--profile-startup' in sys.argv:
+        print(f"[startup] {elapsed * 1000:8.1f} ms  {phase}", file=sys.stderr)
+
 class HyperlinkManager:
     def __init__(self, text):
         self.text = text
@@ -51,36 +93,29 @@ class HyperlinkManager:
                 return
 
 class HealthcareChatbot:
+    # Pages that use the diagnosis engine as soon as they are shown
+    ENGINE_PAGES = ("ChatbotPage", "TraditionalDiagnosisPage", "AdaptiveDiagnosisPage")
+    
     def __init__(self):
-        # Load datasets
-        self.training_dataset = pd.read_csv('Training.csv')
-        self.test_dataset = pd.read_csv('Testing.csv')
-        
-        # Prepare data
-        self.X = self.training_dataset.iloc[:, 0:132].values
-        self.Y = self.training_dataset.iloc[:, -1].values
-        
-        # Dimensionality reduction
-        self.dimensionality_reduction = self.training_dataset.groupby(self.training_dataset['prognosis']).max()
-        
-        # Encode labels
-        self.labelencoder = LabelEncoder()
-        self.y = self.labelencoder.fit_transform(self.Y)
-        
-        # Train classifier
-        self.classifier = DecisionTreeClassifier()
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            self.X, self.y, test_size=0.25, random_state=0)
-        self.classifier.fit(self.X_train, self.y_train)
-        
-        # Prepare symptom list
-        self.cols = self.training_dataset.columns[:-1]
-        self.all_symptoms = list(self.cols)
-        
-        # Load doctors data
-        self.doctors = pd.read_csv('doctors_dataset.csv', names=['Name', 'Description'])
-        self.diseases = pd.DataFrame(self.dimensionality_reduction.index)
-        self.doctors['disease'] = self.diseases['prognosis']
+        profile_startup("imports")
+        
+        # Background workers so diagnosis never blocks the Tk event loop; the
+        # first one loads the diagnosis engine while the main page is shown
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="diagnosis")
+        # Jobs not yet finished, cancelled on exit (shutdown(cancel_futures=True) needs 3.9)
+        self.futures = set()
+        self.engine_future = self.submit(self.executor, load_engine)
+        self.engine_future.add_done_callback(lambda future: profile_startup("engine_loaded"))
+        # Model updates get their own thread, so a refit never delays a diagnosis
+        self.update_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-update")
+        
+        # Credential store; old per-user files are imported in the background
+        self.users = UserStore()
+        self.users.start_legacy_migration()
+        
+        # The patient's symptoms and Q&A walk, diagnosed by whichever model is current
+        self.sessions = SessionManager(lambda: self.engine, idle_timeout=None)
+        self.session_id = self.sessions.create().session_id
         
         # Initialize GUI
         self.root = Tk()
@@ -103,16 +138,15 @@ class HealthcareChatbot:
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
         
-        # Initialize pages
+        # Pages are built the first time they are shown
+        self.pages = {F.__name__: F for F in (MainPage, LoginPage, RegisterPage, ChatbotPage,
+                                              TraditionalDiagnosisPage, AdaptiveDiagnosisPage)}
         self.frames = {}
-        for F in (MainPage, LoginPage, RegisterPage, ChatbotPage, TraditionalDiagnosisPage):
-            page_name = F.__name__
-            frame = F(parent=self.container, controller=self)
-            self.frames[page_name] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        self.waiting_page = None
         
         # Show main page first
         self.show_frame("MainPage")
+        profile_startup("main_page")
         
         # Status bar
         self.status_var = StringVar()
@@ -122,13 +156,53 @@ class HealthcareChatbot:
                               font=self.body_font, bg=LIGHT_GRAY)
         self.status_bar.pack(side=BOTTOM, fill=X)
     
+    @property
+    def engine(self):
+        """The current diagnosis engine, waiting for the background load if needed"""
+        return self.engine_future.result().engine
+    
+    @property
+    def cols(self):
+        return self.engine.cols
+    
+    @property
+    def all_symptoms(self):
+        return self.engine.all_symptoms
+    
     def show_frame(self, page_name):
-        """Show a frame for the given page name"""
-        frame = self.frames[page_name]
+        """Show a frame for the given page name, building it on first use"""
+        self.waiting_page = None
+        frame = self.frames.get(page_name)
+        if frame is None:
+            if page_name in self.ENGINE_PAGES and not self.engine_future.done():
+                # Keep the window responsive until the model has loaded
+                self.waiting_page = page_name
+                self.update_status("Loading diagnosis model...")
+                self.root.after(ENGINE_POLL_MS, self.show_waiting_page, page_name)
+                return
+            if page_name in self.ENGINE_PAGES and self.engine_future.exception() is not None:
+                self.update_status(f"Could not load the diagnosis model: {self.engine_future.exception()}")
+                return
+            frame = self.pages[page_name](parent=self.container, controller=self)
+            self.frames[page_name] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
         frame.tkraise()
     
+    def show_waiting_page(self, page_name):
+        """Show a page that was waiting for the engine, unless the user moved on"""
+        if self.waiting_page != page_name:
+            return
+        if not self.engine_future.done():
+            self.root.after(ENGINE_POLL_MS, self.show_waiting_page, page_name)
+            return
+        self.show_frame(page_name)
+        if page_name in self.frames:
+            self.update_status("Ready")
+    
     def update_status(self, message):
         """Update status bar message"""
+        if METRICS.enabled:
+            message = f"{message}  [{METRICS.status_line(DEBUG_STAGES)}]"
         self.status_var.set(message)
     
     def authenticate(self, username, password):
@@ -137,16 +211,13 @@ class HealthcareChatbot:
             self.update_status("Please enter both username and password")
             return False
             
-        list_of_files = os.listdir()
-        if username in list_of_files:
-            with open(username, "r") as file:
-                verify = file.read().splitlines()
-                if password in verify:
-                    self.update_status("Login successful")
-                    return True
-                else:
-                    self.update_status("Incorrect password")
-                    return False
+        status = self.users.authenticate(username, password)
+        if status == AUTH_OK:
+            self.update_status("Login successful")
+            return True
+        elif status == AUTH_BAD_PASSWORD:
+            self.update_status("Incorrect password")
+            return False
         else:
             self.update_status("User not found. Please register.")
             return False
@@ -157,58 +228,25 @@ class HealthcareChatbot:
             self.update_status("Please enter both username and password")
             return False
             
-        if username in os.listdir():
+        if not self.users.register(username, password):
             self.update_status("Username already exists")
             return False
-            
-        with open(username, "w") as file:
-            file.write(f"{username}\n{password}")
         
         self.update_status("Registration successful")
         return True
     
-    def analyze_symptoms(self, symptoms):
+    def analyze_symptoms(self, symptoms, top_k=None):
         """Analyze the entered symptoms and provide diagnosis"""
         if not symptoms:
             self.update_status("Please add at least one symptom")
             return None
             
         try:
-            # Convert symptoms to feature vector
-            symptom_indices = [self.all_symptoms.index(symptom) for symptom in symptoms 
-                            if symptom in self.all_symptoms]
+            result = self.engine.analyze(symptoms, top_k=top_k)
             
-            if not symptom_indices:
+            if result is None:
                 self.update_status("No valid symptoms found for analysis")
                 return None
-                
-            # Create feature vector
-            X = np.zeros(len(self.all_symptoms))
-            for idx in symptom_indices:
-                X[idx] = 1
-                
-            # Predict disease
-            prediction = self.classifier.predict([X])
-            disease = self.labelencoder.inverse_transform(prediction)[0]
-            
-            # Get disease info
-            disease_data = self.dimensionality_reduction.loc[disease]
-            symptoms_given = [col for col, val in zip(self.cols, disease_data) if val == 1]
-            
-            # Calculate confidence level
-            confidence_level = len(set(symptoms) & set(symptoms_given)) / len(symptoms_given) if len(symptoms_given) > 0 else 0.0
-            
-            # Doctor recommendation
-            row = self.doctors[self.doctors['disease'] == disease]
-            
-            result = {
-                "disease": disease,
-                "symptoms_present": symptoms,
-                "symptoms_given": symptoms_given,
-                "confidence": confidence_level,
-                "doctor": row['Name'].values[0] if not row.empty else None,
-                "doctor_link": row['Description'].values[0] if not row.empty else None
-            }
             
             return result
             
@@ -216,9 +254,41 @@ class HealthcareChatbot:
             self.update_status(f"Error during diagnosis: {str(e)}")
             return None
     
+    def submit_analysis(self, top_k=None):
+        """Start analyzing the session's symptoms on a worker thread and return its Future"""
+        return self.submit(self.executor, self.sessions.analyze, self.session_id, top_k)
+    
+    def submit(self, executor, func, *args):
+        """Run func on executor, keeping its Future until done so exit can cancel it"""
+        future = executor.submit(func, *args)
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+        return future
+    
+    def refresh_doctors(self):
+        """Pick up edits to the doctor files in the background, then check again later"""
+        if self.engine_future.done() and self.engine_future.exception() is None:
+            self.submit(self.executor, self.engine.refresh_doctors)
+        self.root.after(DOCTOR_REFRESH_MS, self.refresh_doctors)
+    
+    def refresh_model(self):
+        """Fold newly confirmed cases into the model in the background, then check again later"""
+        if self.engine_future.done() and self.engine_future.exception() is None:
+            updater = self.engine_future.result()
+            if updater.pending():
+                self.submit(self.update_executor, updater.refresh)
+        self.root.after(MODEL_REFRESH_MS, self.refresh_model)
+    
     def run(self):
         """Run the application"""
+        self.root.after_idle(profile_startup, "first_window")
+        self.root.after(DOCTOR_REFRESH_MS, self.refresh_doctors)
+        self.root.after(MODEL_REFRESH_MS, self.refresh_model)
         self.root.mainloop()
+        for future in list(self.futures):
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        self.update_executor.shutdown(wait=False)
 
 class MainPage(Frame):
     def __init__(self, parent, controller):
@@ -274,6 +344,7 @@ class MainPage(Frame):
         right_frame.pack(side=RIGHT, fill=BOTH, padx=20)
         
         try:
+            from PIL import Image, ImageTk
             img = Image.open("healthcare_icon.png")
             img = img.resize((400, 400), Image.LANCZOS)
             self.logo = ImageTk.PhotoImage(img)
@@ -461,7 +532,6 @@ class ChatbotPage(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent, bg=LIGHT_GRAY)
         self.controller = controller
-        self.user_symptoms = []
         
         # Main frame
         main_frame = Frame(self, bg=LIGHT_GRAY)
@@ -491,7 +561,7 @@ class ChatbotPage(Frame):
         welcome_label.pack(fill=X)
         
         # Symptom input area
-        input_frame = LabelFrame(chat_frame, text=" Enter Your Symptoms ", 
+        self.input_frame = input_frame = LabelFrame(chat_frame, text=" Enter Your Symptoms ", 
                                font=self.controller.body_font,
                                bg=LIGHT_GRAY, padx=10, pady=10)
         input_frame.pack(fill=X, pady=5)
@@ -508,6 +578,17 @@ class ChatbotPage(Frame):
         # Bind Enter key to add symptom
         self.symptom_entry.bind('<Return>', lambda event: self.add_symptom())
         
+        # Type-ahead suggestions, shown below the entry while typing
+        self.suggest_job = None
+        self.suggestion_list = Listbox(chat_frame, height=5,
+                                     font=self.controller.body_font,
+                                     activestyle='none')
+        self.symptom_entry.bind('<KeyRelease>', self.schedule_suggestions)
+        self.symptom_entry.bind('<Down>', self.focus_suggestions)
+        self.suggestion_list.bind('<Double-Button-1>', self.choose_suggestion)
+        self.suggestion_list.bind('<Return>', self.choose_suggestion)
+        self.suggestion_list.bind('<Escape>', lambda event: self.hide_suggestions())
+        
         # Selected symptoms display
         selected_frame = LabelFrame(chat_frame, text=" Selected Symptoms ", 
                                   font=self.controller.body_font,
@@ -565,12 +646,23 @@ class ChatbotPage(Frame):
               padx=10, pady=5,
               relief=FLAT).pack(side=LEFT, padx=5)
         
+        Button(control_frame, text="Adaptive Diagnosis", 
+              command=lambda: controller.show_frame("AdaptiveDiagnosisPage"),
+              font=self.controller.button_font,
+              bg=ACCENT, fg=WHITE,
+              padx=10, pady=5,
+              relief=FLAT).pack(side=LEFT, padx=5)
+        
         Button(control_frame, text="Logout", 
               command=lambda: controller.show_frame("MainPage"),
               font=self.controller.button_font,
               bg=ERROR, fg=WHITE,
               padx=10, pady=5,
               relief=FLAT).pack(side=RIGHT, padx=5)
+        
+        # In-flight indicator, shown only while an analysis is running
+        self.pending_analysis = None
+        self.progress = ttk.Progressbar(control_frame, mode='indeterminate', length=150)
     
     def add_symptom(self):
         """Add symptom to the list after fuzzy matching"""
@@ -579,41 +671,146 @@ class ChatbotPage(Frame):
             return
             
         # Find closest match in our symptom list
-        matches = get_close_matches(symptom, self.controller.all_symptoms, n=1, cutoff=0.6)
+        matched_symptom = self.controller.engine.matcher.best(symptom, cutoff=0.6)
         
-        if matches:
-            matched_symptom = matches[0]
-            if matched_symptom not in self.user_symptoms:
-                self.user_symptoms.append(matched_symptom)
+        if matched_symptom:
+            sessions, session_id = self.controller.sessions, self.controller.session_id
+            if matched_symptom not in sessions.symptoms(session_id):
+                sessions.add_symptom(session_id, matched_symptom)
                 self.selected_symptoms_text.insert(END, f"• {matched_symptom}\n")
                 self.symptom_entry.delete(0, END)
+                self.hide_suggestions()
                 self.controller.update_status(f"Added symptom: {matched_symptom}")
             else:
                 self.controller.update_status("Symptom already added")
         else:
             self.controller.update_status("No matching symptom found. Please try different wording.")
     
+    def schedule_suggestions(self, event=None):
+        """Refresh suggestions once the user pauses typing"""
+        if event is not None and event.keysym in ('Return', 'Up', 'Down', 'Escape'):
+            return
+        if self.suggest_job is not None:
+            self.after_cancel(self.suggest_job)
+        self.suggest_job = self.after(SUGGEST_DELAY_MS, self.update_suggestions)
+    
+    def update_suggestions(self):
+        """Show symptom names matching the current entry text"""
+        self.suggest_job = None
+        suggestions = self.controller.engine.completer.complete(self.symptom_entry.get())
+        
+        self.suggestion_list.delete(0, END)
+        if not suggestions:
+            self.hide_suggestions()
+            return
+            
+        for suggestion in suggestions:
+            self.suggestion_list.insert(END, suggestion)
+        self.suggestion_list.config(height=len(suggestions))
+        if not self.suggestion_list.winfo_manager():
+            self.suggestion_list.pack(fill=X, pady=(0, 5), after=self.input_frame)
+    
+    def hide_suggestions(self):
+        """Hide the suggestion list"""
+        if self.suggest_job is not None:
+            self.after_cancel(self.suggest_job)
+            self.suggest_job = None
+        self.suggestion_list.pack_forget()
+    
+    def focus_suggestions(self, event=None):
+        """Move keyboard focus from the entry into the suggestion list"""
+        if self.suggestion_list.size():
+            self.suggestion_list.focus_set()
+            self.suggestion_list.selection_clear(0, END)
+            self.suggestion_list.selection_set(0)
+            self.suggestion_list.activate(0)
+    
+    def choose_suggestion(self, event=None):
+        """Add the selected suggestion as a symptom"""
+        selection = self.suggestion_list.curselection()
+        if not selection:
+            return
+        self.symptom_entry.delete(0, END)
+        self.symptom_entry.insert(0, self.suggestion_list.get(selection[0]))
+        self.hide_suggestions()
+        self.add_symptom()
+        self.symptom_entry.focus_set()
+    
     def analyze_symptoms(self):
         """Analyze the entered symptoms and provide diagnosis"""
-        if not self.user_symptoms:
+        if not self.controller.sessions.symptoms(self.controller.session_id):
             self.controller.update_status("Please add at least one symptom")
             return
             
+        self.cancel_analysis()
         self.diagnosis_text.delete(1.0, END)
         
         # Show loading message
         self.diagnosis_text.insert(END, "Analyzing symptoms...\n\n")
-        self.diagnosis_text.update()
-        
-        # Get analysis from controller
-        result = self.controller.analyze_symptoms(self.user_symptoms)
+        self.controller.update_status("Analyzing symptoms...")
+        self.progress.pack(side=LEFT, padx=5)
+        self.progress.start(10)
+        
+        # Run the analysis in the background and poll for the result
+        # The chat page shows the top-k differential with calibrated probabilities
+        from differential import DEFAULT_TOP_K
+        self.pending_analysis = self.controller.submit_analysis(top_k=DEFAULT_TOP_K)
+        self.after(ANALYSIS_POLL_MS, self.poll_analysis, self.pending_analysis)
+    
+    def poll_analysis(self, future):
+        """Deliver a finished background analysis on the Tk thread"""
+        if future is not self.pending_analysis:
+            # Cancelled or superseded by a newer analysis
+            return
+        if not future.done():
+            self.after(ANALYSIS_POLL_MS, self.poll_analysis, future)
+            return
+            
+        self.pending_analysis = None
+        self.stop_progress()
+        self.diagnosis_text.delete(1.0, END)
         
-        if not result:
+        try:
+            result = future.result()
+        except Exception as e:
+            self.controller.update_status(f"Error during diagnosis: {str(e)}")
             return
             
-        # Display results
+        if result is None:
+            self.controller.update_status("No valid symptoms found for analysis")
+            return
+            
+        with METRICS.time('render'):
+            self.show_result(result)
+        self.controller.update_status("Analysis complete")
+    
+    def cancel_analysis(self):
+        """Cancel any analysis that is still in flight"""
+        if self.pending_analysis is not None:
+            self.pending_analysis.cancel()
+            self.pending_analysis = None
+            self.stop_progress()
+    
+    def stop_progress(self):
+        """Hide the in-flight indicator"""
+        self.progress.stop()
+        self.progress.pack_forget()
+    
+    def show_result(self, result):
+        """Display a diagnosis result"""
         self.diagnosis_text.insert(END, "You may have: ", "bold")
-        self.diagnosis_text.insert(END, f"{result['disease']}\n\n", "accent")
+        self.diagnosis_text.insert(END, f"{result['disease']}", "accent")
+        if 'probability' in result:
+            self.diagnosis_text.insert(END, f" ({result['probability']:.0%} likely)")
+        self.diagnosis_text.insert(END, "\n\n")
+        
+        # Other conditions that fit the reported symptoms
+        others = result.get('differential', [])[1:]
+        if others:
+            self.diagnosis_text.insert(END, "Other possible conditions:\n", "bold")
+            for candidate in others:
+                self.diagnosis_text.insert(END, f"• {candidate['disease']} ({candidate['probability']:.0%})\n")
+            self.diagnosis_text.insert(END, "\n")
         
         self.diagnosis_text.insert(END, "Symptoms you reported:\n", "bold")
         for symptom in result['symptoms_present']:
@@ -631,27 +828,39 @@ class ChatbotPage(Frame):
             self.diagnosis_text.insert(END, "Recommended specialist:\n", "bold")
             self.diagnosis_text.insert(END, f"• {result['doctor']}\n\n")
             
+            hyperlink = HyperlinkManager(self.diagnosis_text)
             if result['doctor_link']:
-                hyperlink = HyperlinkManager(self.diagnosis_text)
                 def click1():
                     webbrowser.open_new(str(result['doctor_link']))
                 self.diagnosis_text.insert(END, "More information: ", "bold")
                 self.diagnosis_text.insert(END, "Visit ", hyperlink.add(click1))
                 self.diagnosis_text.insert(END, str(result['doctor_link']) + "\n")
+            
+            # Other doctors for this condition, best rated first
+            others = result.get('doctors', [])[1:]
+            if others:
+                self.diagnosis_text.insert(END, "\nOther doctors:\n", "bold")
+                for doctor in others:
+                    specialty = f" ({doctor['specialty']})" if doctor['specialty'] else ""
+                    self.diagnosis_text.insert(END, f"• {doctor['name']}{specialty}",
+                                    hyperlink.add(lambda link=doctor['link']: webbrowser.open_new(link)))
+                    self.diagnosis_text.insert(END, "\n")
     
     def clear_symptoms(self):
         """Clear all entered symptoms"""
-        self.user_symptoms = []
+        self.cancel_analysis()
+        self.controller.sessions.clear_symptoms(self.controller.session_id)
         self.selected_symptoms_text.delete(1.0, END)
         self.diagnosis_text.delete(1.0, END)
+        self.hide_suggestions()
         self.controller.update_status("Cleared all symptoms")
 
 class TraditionalDiagnosisPage(Frame):
+    title = "Traditional Diagnosis"
+    
     def __init__(self, parent, controller):
         Frame.__init__(self, parent, bg=LIGHT_GRAY)
         self.controller = controller
-        self.symptoms_present = []
-        self.current_node = 0
         
         # Main frame
         main_frame = Frame(self, bg=LIGHT_GRAY)
@@ -661,7 +870,7 @@ class TraditionalDiagnosisPage(Frame):
         header_frame = Frame(main_frame, bg=PRIMARY)
         header_frame.pack(fill=X, pady=(0, 20))
         
-        Label(header_frame, text="Traditional Diagnosis", 
+        Label(header_frame, text=self.title, 
              font=self.controller.title_font, bg=PRIMARY, fg=WHITE, padx=20, pady=10).pack(fill=X)
         
         # Question area
@@ -733,8 +942,9 @@ class TraditionalDiagnosisPage(Frame):
     
     def ask_question(self):
         """Ask the next question in the decision tree"""
-        if self.controller.classifier.tree_.feature[self.current_node] != _tree.TREE_UNDEFINED:
-            question = self.controller.cols[self.controller.classifier.tree_.feature[self.current_node]] + "?"
+        symptom = self.controller.sessions.question(self.controller.session_id)
+        if symptom is not None:
+            question = symptom + "?"
             self.question_text.delete(1.0, END)
             self.question_text.insert(END, question)
         else:
@@ -742,20 +952,18 @@ class TraditionalDiagnosisPage(Frame):
     
     def answer_yes(self):
         """Process yes answer"""
-        self.symptoms_present.append(self.controller.cols[self.controller.classifier.tree_.feature[self.current_node]])
-        self.current_node = self.controller.classifier.tree_.children_right[self.current_node]
+        self.controller.sessions.answer(self.controller.session_id, True)
         self.ask_question()
     
     def answer_no(self):
         """Process no answer"""
-        self.current_node = self.controller.classifier.tree_.children_left[self.current_node]
+        self.controller.sessions.answer(self.controller.session_id, False)
         self.ask_question()
     
     def provide_diagnosis(self):
         """Provide final diagnosis in traditional format"""
         try:
-            # Get analysis from controller
-            result = self.controller.analyze_symptoms(self.symptoms_present)
+            result = self.diagnose()
             
             if not result:
                 return
@@ -782,23 +990,78 @@ class TraditionalDiagnosisPage(Frame):
                 self.response_text.insert(END, "Recommended specialist:\n", "bold")
                 self.response_text.insert(END, f"• {result['doctor']}\n\n")
                 
+                hyperlink = HyperlinkManager(self.response_text)
                 if result['doctor_link']:
-                    hyperlink = HyperlinkManager(self.response_text)
                     def click1():
                         webbrowser.open_new(str(result['doctor_link']))
                     self.response_text.insert(END, "More information: ", "bold")
                     self.response_text.insert(END, "Visit ", hyperlink.add(click1))
                     self.response_text.insert(END, str(result['doctor_link']) + "\n")
+                
+                # Other doctors for this condition, best rated first
+                others = result.get('doctors', [])[1:]
+                if others:
+                    self.response_text.insert(END, "\nOther doctors:\n", "bold")
+                    for doctor in others:
+                        specialty = f" ({doctor['specialty']})" if doctor['specialty'] else ""
+                        self.response_text.insert(END, f"• {doctor['name']}{specialty}",
+                                        hyperlink.add(lambda link=doctor['link']: webbrowser.open_new(link)))
+                        self.response_text.insert(END, "\n")
             
         except Exception as e:
             self.controller.update_status(f"Error during diagnosis: {str(e)}")
             self.response_text.insert(END, f"Error: {str(e)}\n")
     
+    def diagnose(self):
+        """Get analysis of the answered symptoms from the controller"""
+        return self.controller.analyze_symptoms(self.controller.sessions.qa_symptoms(self.controller.session_id))
+    
     def clear_response(self):
         """Clear the response area"""
         self.response_text.delete(1.0, END)
         self.controller.update_status("Cleared diagnosis results")
 
+class AdaptiveDiagnosisPage(TraditionalDiagnosisPage):
+    """Yes/no diagnosis that asks the most informative question first"""
+    title = "Adaptive Diagnosis"
+    
+    def __init__(self, parent, controller):
+        self.session = controller.engine.questioner.start()
+        TraditionalDiagnosisPage.__init__(self, parent, controller)
+    
+    def ask_question(self):
+        """Ask the most informative remaining question"""
+        symptom = self.session.question()
+        if symptom is not None:
+            self.question_text.delete(1.0, END)
+            self.question_text.insert(END, symptom + "?")
+        else:
+            self.provide_diagnosis()
+    
+    def answer_yes(self):
+        """Process yes answer"""
+        if self.session.question() is None:
+            return
+        self.session.answer(True)
+        self.ask_question()
+    
+    def answer_no(self):
+        """Process no answer"""
+        if self.session.question() is None:
+            return
+        self.session.answer(False)
+        self.ask_question()
+    
+    def diagnose(self):
+        """Diagnose the leading disease of the adaptive session"""
+        return self.controller.engine.result_for(self.session.disease(), self.session.symptoms_present)
+    
+    def clear_response(self):
+        """Clear the response area and start a new adaptive session"""
+        TraditionalDiagnosisPage.clear_response(self)
+        self.session = self.controller.engine.questioner.start()
+        self.ask_question()
+
 if __name__ == "__main__":
     app = HealthcareChatbot()
     app.run()
\ No newline at end of file
@@ -0,0 +1,327 @@
+"""Streaming bulk triage of large symptom files.
+
+The input is read in fixed-size chunks; each chunk is encoded into a sparse
+(CSR) 0/1 symptom matrix in the front-end process and scored with one vectorized
+DiagnosisEngine.score_rows call in a pool of worker processes.  Results are
+written in input order as soon as their chunk is done, and at most
+``2 x workers`` chunks are in flight, so memory stays bounded however large
+the file is.  Symptom columns and names are matched against the column
+vocabulary of Training.csv.
+
+Accepted inputs:
+
+    CSV with one 0/1 column per symptom (the Training.csv / Testing.csv layout);
+        other columns such as prognosis are ignored
+    CSV with a "symptoms" column of ;-separated symptom names
+    JSONL with one {"id": ..., "symptoms": [...]} object, or plain list, per line
+
+An "id" column or key is copied to the output; otherwise the 0-based input row
+number is used.  Malformed JSONL lines and non-string symptom entries are
+skipped (the line becomes a row without known symptoms) and counted in the
+final report.  The output is CSV, or JSONL when its name ends in .jsonl, with
+id, disease, confidence, doctor and doctor_link per row (and probability and
+differential with --top-k).  Rows without known symptoms get an empty disease.
+
+Run ``python bulk_triage.py patients.csv results.csv --workers 4``.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sparse_symptoms import as_csr, csr_rows, row_lengths
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Chunks submitted to the pool per worker before waiting for the oldest one
+CHUNKS_PER_WORKER = 2
+
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+FIELDS = ['id', 'disease', 'confidence', 'doctor', 'doctor_link']
+DIFFERENTIAL_FIELDS = ['probability', 'differential']
+
+# Worker-process state, set up once by _init_worker
+_engine = None
+
+
+def _init_worker(method):
+    """Load the model once in each pool worker"""
+    global _engine
+    from diagnosis_engine import DiagnosisEngine
+    _engine = DiagnosisEngine.load(cache_size=0, method=method)
+
+
+def _score_chunk(X, top_k):
+    """Score a chunk of CSR 0/1 rows; None for rows without symptoms
+
+    Each result is (disease, confidence, doctor, doctor_link, differential),
+    with differential a tuple of (disease, probability) pairs or None.
+    """
+    results = [None] * X.shape[0]
+    known = np.flatnonzero(row_lengths(X))
+    if not len(known):
+        return results
+    diseases = _engine.vocabulary.diseases
+    doctors = [_engine.directory.best(disease) for disease in diseases]
+    labels, confidence, differentials = _engine.score_rows(X[known], top_k)
+    for row, label, conf, differential in zip(known.tolist(), labels.tolist(),
+                                              confidence.tolist(), differentials):
+        doctor = doctors[label]
+        if differential is not None:
+            differential = tuple((diseases[other], probability) for other, probability in differential)
+        results[row] = (str(diseases[label]), conf, doctor.name if doctor else None,
+                        doctor.link if doctor else None, differential)
+    return results
+
+
+# Input readers, each yielding (ids, X, unknown symptom count, malformed count) per chunk
+
+def is_jsonl(path):
+    return path.lower().endswith(JSONL_EXTENSIONS)
+
+
+def read_csv_chunks(path, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Chunks of a symptom-column CSV or a CSV with a "symptoms" column"""
+    import pandas as pd
+
+    with open(path, newline='', encoding='utf-8') as file:
+        header = next(csv.reader(file), [])
+    index = symptom_index(columns)
+    id_column = header.index('id') if 'id' in header else None
+
+    if 'symptoms' in header:
+        usecols = ['symptoms'] + (['id'] if id_column is not None else [])
+        chunks = pd.read_csv(path, usecols=usecols, dtype=str, keep_default_na=False, chunksize=chunk_size)
+        start = 0
+        for chunk in chunks:
+            symptom_lists = [text.split(';') for text in chunk['symptoms']]
+            X, unknown, malformed = encode_lists(symptom_lists, index, len(columns))
+            ids = chunk['id'].tolist() if id_column is not None else list(range(start, start + len(chunk)))
+            start += len(chunk)
+            yield ids, X, unknown, malformed
+        return
+
+    # Match symptom columns by position, since Training.csv repeats a column
+    # name (pandas would rename the copy)
+    occurrences = {}
+    for idx, name in enumerate(columns):
+        occurrences.setdefault(name, []).append(idx)
+    positions, targets = [], []
+    for position, name in enumerate(header):
+        if occurrences.get(name):
+            positions.append(position)
+            targets.append(occurrences[name].pop(0))
+    if not positions:
+        raise ValueError(f"{path} has neither a 'symptoms' column nor any Training.csv symptom column")
+    usecols = positions + ([id_column] if id_column is not None else [])
+    chunks = pd.read_csv(path, header=None, skiprows=1, usecols=usecols, chunksize=chunk_size)
+    start = 0
+    for chunk in chunks:
+        X = np.zeros((len(chunk), len(columns)), dtype=np.uint8)
+        X[:, targets] = chunk[positions].fillna(0).values != 0
+        X = as_csr(X)
+        ids = chunk[id_column].tolist() if id_column is not None else list(range(start, start + len(chunk)))
+        start += len(chunk)
+        yield ids, X, 0, 0
+
+
+def read_jsonl_chunks(path, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Chunks of a JSONL file of symptom lists
+
+    A line that is not a JSON object or list, or whose "symptoms" is not a
+    list, is kept as a row without symptoms and counted as malformed.
+    """
+    index = symptom_index(columns)
+    ids, symptom_lists = [], []
+    malformed = 0
+    with open(path, encoding='utf-8', errors='replace') as file:
+        row = 0
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            row_id, symptoms = row, None
+            if isinstance(record, dict):
+                row_id = record.get('id', row)
+                symptoms = record.get('symptoms') or []
+            elif isinstance(record, list):
+                symptoms = record
+            if not isinstance(symptoms, list):
+                malformed += 1
+                symptoms = []
+            ids.append(row_id)
+            symptom_lists.append(symptoms)
+            row += 1
+            if len(ids) == chunk_size:
+                X, unknown, bad = encode_lists(symptom_lists, index, len(columns))
+                yield ids, X, unknown, malformed + bad
+                ids, symptom_lists = [], []
+                malformed = 0
+    if ids:
+        X, unknown, bad = encode_lists(symptom_lists, index, len(columns))
+        yield ids, X, unknown, malformed + bad
+
+
+def symptom_index(columns):
+    """Column index of each symptom name; like SymptomVocabulary, a repeated
+    name maps to its last column"""
+    return {name: idx for idx, name in enumerate(columns)}
+
+
+def encode_lists(symptom_lists, index, n_columns):
+    """(rows x symptoms) CSR 0/1 matrix for lists of names, the unknown name
+    count and the count of skipped entries that are not strings"""
+    index_lists = []
+    unknown = malformed = 0
+    for symptoms in symptom_lists:
+        indices = []
+        for name in symptoms:
+            if not isinstance(name, str):
+                malformed += 1
+                continue
+            idx = index.get(name.strip())
+            if idx is None:
+                unknown += bool(name.strip())
+                continue
+            indices.append(idx)
+        index_lists.append(sorted(set(indices)))
+    return csr_rows(index_lists, n_columns), unknown, malformed
+
+
+# Output writers
+
+class CsvOutput:
+    def __init__(self, file, top_k):
+        self.top_k = top_k
+        self.writer = csv.writer(file)
+        self.writer.writerow(FIELDS + (DIFFERENTIAL_FIELDS if top_k else []))
+
+    def write(self, ids, results):
+        rows = []
+        for row_id, result in zip(ids, results):
+            if result is None:
+                rows.append([row_id, '', '', '', ''] + (['', ''] if self.top_k else []))
+                continue
+            disease, confidence, doctor, link, differential = result
+            row = [row_id, disease, f"{confidence:.4f}", doctor or '', link or '']
+            if self.top_k:
+                row += [f"{differential[0][1]:.4f}",
+                        ';'.join(f"{name}:{probability:.4f}" for name, probability in differential)]
+            rows.append(row)
+        self.writer.writerows(rows)
+
+
+class JsonlOutput:
+    def __init__(self, file, top_k):
+        self.file = file
+
+    def write(self, ids, results):
+        lines = []
+        for row_id, result in zip(ids, results):
+            record = {"id": row_id, "disease": None}
+            if result is not None:
+                disease, confidence, doctor, link, differential = result
+                record.update(disease=disease, confidence=confidence, doctor=doctor, doctor_link=link)
+                if differential is not None:
+                    record["probability"] = differential[0][1]
+                    record["differential"] = [{"disease": name, "probability": probability}
+                                              for name, probability in differential]
+            lines.append(json.dumps(record) + "\n")
+        self.file.writelines(lines)
+
+
+def triage(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, top_k=None,
+           method='model', progress=True):
+    """Score every row of input_path into output_path; return summary counts
+
+    ``workers=0`` scores in this process instead of a process pool.
+    """
+    from model_artifact import TRAINING_CSV
+    from training_data import load_or_convert
+
+    columns = load_or_convert(TRAINING_CSV).columns
+    read_chunks = read_jsonl_chunks if is_jsonl(input_path) else read_csv_chunks
+    output_type = JsonlOutput if is_jsonl(output_path) else CsvOutput
+    workers = (os.cpu_count() or 1) if workers is None else workers
+
+    pool = None
+    if workers:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(method,))
+    else:
+        _init_worker(method)
+
+    summary = {"rows": 0, "no_known_symptoms": 0, "unknown_symptoms": 0, "malformed": 0}
+    start = time.perf_counter()
+    pending = deque()
+
+    def finish(ids, results, file):
+        output.write(ids, results)
+        file.flush()
+        summary["rows"] += len(ids)
+        summary["no_known_symptoms"] += results.count(None)
+        if progress:
+            rate = summary["rows"] / (time.perf_counter() - start)
+            print(f"\r{summary['rows']} rows, {rate:.0f} rows/s", end='', file=sys.stderr)
+
+    try:
+        with open(output_path, 'w', newline='', encoding='utf-8') as file:
+            output = output_type(file, top_k)
+            for ids, X, unknown, malformed in read_chunks(input_path, columns, chunk_size):
+                summary["unknown_symptoms"] += unknown
+                summary["malformed"] += malformed
+                if pool is None:
+                    finish(ids, _score_chunk(X, top_k), file)
+                    continue
+                pending.append((ids, pool.submit(_score_chunk, X, top_k)))
+                if len(pending) >= workers * CHUNKS_PER_WORKER:
+                    ids, future = pending.popleft()
+                    finish(ids, future.result(), file)
+            while pending:
+                ids, future = pending.popleft()
+                finish(ids, future.result(), file)
+    finally:
+        if pool is not None:
+            # Drop chunks not yet started (shutdown(cancel_futures=True) needs Python 3.9)
+            for _, future in pending:
+                future.cancel()
+            pool.shutdown()
+    if progress:
+        print(file=sys.stderr)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a large CSV or JSONL file of symptom reports")
+    parser.add_argument('input', help="CSV or JSONL (.jsonl/.ndjson) file of symptom reports")
+    parser.add_argument('output', help="results file, JSONL if it ends in .jsonl, otherwise CSV")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="rows scored per task")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per core, 0: score in this process)")
+    parser.add_argument('--top-k', type=int, default=None,
+                        help="add the calibrated probability and top-k differential")
+    parser.add_argument('--method', choices=('model', 'profile'), default='model',
+                        help="diagnose by the model backend or by bitset profile similarity")
+    parser.add_argument('--quiet', action='store_true', help="do not report progress")
+    args = parser.parse_args()
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be positive")
+    summary = triage(args.input, args.output, args.chunk_size, args.workers, args.top_k,
+                     args.method, progress=not args.quiet)
+    print(f"{summary['rows']} rows in {summary['seconds']:.1f} s, "
+          f"{summary['no_known_symptoms']} without known symptoms, "
+          f"{summary['unknown_symptoms']} unrecognised symptom names, "
+          f"{summary['malformed']} malformed records or symptom entries skipped", file=sys.stderr)
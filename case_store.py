@@ -0,0 +1,82 @@
+"""Append-only delta store of newly confirmed, labeled cases.
+
+Each case is one JSON line, in the same shape bulk_triage.py reads:
+
+    {"symptoms": ["itching", "skin_rash"], "disease": "Fungal infection"}
+
+Appends are single O_APPEND writes of whole lines, so several processes can
+add cases to the same file, and readers only ever see complete lines.  Readers
+keep a byte offset and read just the cases added since, which is how
+model_updates.py folds them into the running model without retraining on
+Training.csv.
+"""
+import hashlib
+import json
+import os
+import threading
+
+DELTA_PATH = 'new_cases.jsonl'
+
+
+class CaseStore:
+    def __init__(self, path=DELTA_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, cases):
+        """Append (symptoms, disease) pairs; return the number written"""
+        data = ''.join(json.dumps({"symptoms": list(symptoms), "disease": disease}) + "\n"
+                       for symptoms, disease in cases).encode('utf-8')
+        if not data:
+            return 0
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        return data.count(b"\n")
+
+    def size(self):
+        """Current size of the store in bytes (0 if it does not exist)"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self, offset=0, end=None):
+        """Return the (symptoms, disease) cases after a byte offset, and the new offset
+
+        ``end`` stops at an earlier offset returned by read().  A partly
+        written last line is left for the next read.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                data = file.read(-1 if end is None else end - offset)
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1
+        cases = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                record = json.loads(line)
+                cases.append((record["symptoms"], record["disease"]))
+        return cases, offset + end
+
+    def digest(self, end):
+        """SHA-256 of the first ``end`` bytes of the store, to recognise a
+        store that was replaced since an offset was recorded"""
+        digest = hashlib.sha256()
+        try:
+            with open(self.path, 'rb') as file:
+                remaining = end
+                while remaining > 0:
+                    chunk = file.read(min(remaining, 1 << 16))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    remaining -= len(chunk)
+        except FileNotFoundError:
+            pass
+        return digest.hexdigest()
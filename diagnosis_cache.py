@@ -0,0 +1,67 @@
+"""Bounded LRU cache for diagnosis results.
+
+Entries are keyed by the frozenset of reported symptom indices, so every
+ordering or duplication of the same symptoms shares one entry.  The cache is
+tied to the model_id of the artifact that produced its entries and empties
+itself when a different model is installed.
+"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class DiagnosisCache:
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, model_id=None):
+        self.maxsize = maxsize
+        self.model_id = model_id
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value for a key, or None, updating the counters"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, model_id=None):
+        """Drop every entry, e.g. because a new model artifact was loaded"""
+        with self._lock:
+            self._entries.clear()
+            self.model_id = model_id
+
+    def validate(self, model_id):
+        """Invalidate the cache if it holds entries from a different model"""
+        if model_id != self.model_id:
+            self.invalidate(model_id)
+
+    def stats(self):
+        """Return hit/miss counters and the current size"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,304 @@
+"""GUI-free diagnosis engine shared by bot.py and healthcare_chatbotConsole.py.
+
+The engine only depends on the persisted model artifact, so it can be imported
+and benchmarked from worker processes without tkinter or PIL.  Reported
+symptoms stay sparse throughout: a single diagnosis works on the tuple of
+symptom indices and batches on CSR rows, never on vocabulary-sized vectors.
+"""
+import numpy as np
+from scipy import sparse
+
+from adaptive_questioning import AdaptiveQuestioner
+from diagnosis_cache import DEFAULT_CACHE_SIZE, DiagnosisCache
+from doctor_directory import DoctorDirectory
+from metrics import METRICS
+from model_artifact import ARTIFACT_PATH, load_or_build
+from profile_scoring import ProfileScorer
+from sparse_symptoms import csr_rows
+from qa_token import QATokenCodec
+from symptom_completer import SymptomCompleter
+from symptom_matcher import SymptomMatcher, load_aliases
+from symptom_vocabulary import SymptomVocabulary
+
+
+# How analyze picks the diagnosis when no differential is requested: the
+# artifact's model backend, or bitset profile similarity
+METHOD_MODEL = 'model'
+METHOD_PROFILE = 'profile'
+METHODS = (METHOD_MODEL, METHOD_PROFILE)
+
+
+class DiagnosisEngine:
+    def __init__(self, artifact, cache=None, cache_size=DEFAULT_CACHE_SIZE, method=METHOD_MODEL):
+        if method not in METHODS:
+            raise ValueError(f"Unknown diagnosis method {method!r}, expected one of {METHODS}")
+        self.method = method
+        self.artifact = artifact
+        self.backend = artifact["backend"]
+        self.classes = artifact["classes"]
+        self.cols = artifact["cols"]
+        self.all_symptoms = list(self.cols)
+        self.data_hash = artifact["data_hash"]
+        self.model_id = artifact["model_id"]
+        self.flow = artifact["question_flow"]
+        self.differential = artifact["differential"]
+
+        # Per-class lookup tables, in class id (label-encoder) order
+        self._profiles = np.asarray(artifact["profiles"], dtype=np.uint8)
+        self.vocabulary = SymptomVocabulary(self.cols, self.classes, self._profiles)
+        self.profile_scorer = ProfileScorer(self._profiles)
+        self._set_directory(DoctorDirectory.load(self.vocabulary.diseases))
+        self.questioner = AdaptiveQuestioner(self.vocabulary, self.differential.symptom_probabilities())
+        self.qa_tokens = QATokenCodec(self.flow, self.vocabulary)
+
+        # Fuzzy matcher and type-ahead index over symptom names and lay-term aliases
+        aliases = load_aliases()
+        self.matcher = SymptomMatcher(self.all_symptoms, aliases)
+        self.completer = SymptomCompleter(self.all_symptoms, aliases)
+
+        # Results keyed by symptom index set; a shared cache is reset if it
+        # holds entries from another model
+        self.cache = cache if cache is not None else DiagnosisCache(cache_size, self.model_id)
+        self.cache.validate(self.model_id)
+
+        # Stages of analyze, replaced by timed wrappers in debug mode
+        self._encode = self.vocabulary.encode
+        self._cache_get = self.cache.get
+        if METRICS.enabled:
+            self._instrument()
+
+    def _instrument(self):
+        """Time every stage of a diagnosis and count cache hits and misses"""
+        cache_get = self.cache.get
+
+        def counted_cache_get(key):
+            value = cache_get(key)
+            METRICS.inc('cache_misses' if value is None else 'cache_hits')
+            return value
+
+        self._encode = METRICS.timed('encode', self._encode)
+        self._cache_get = METRICS.timed('cache_lookup', counted_cache_get)
+        self._score = METRICS.timed('predict', self._score)
+        # Doctor lookup and result assembly
+        self._result = METRICS.timed('result', self._result)
+
+        matcher_match = self.matcher.match
+
+        def counted_match(query, n=3, cutoff=0.6):
+            matches = matcher_match(query, n, cutoff)
+            if not matches:
+                METRICS.inc('match_no_result')
+            return matches
+
+        self.matcher.match = METRICS.timed('match', counted_match)
+        self.completer.complete = METRICS.timed('complete', self.completer.complete)
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH, **kwargs):
+        """Create an engine from the persisted artifact, rebuilding it if stale"""
+        return cls(load_or_build(path), **kwargs)
+
+    def encode(self, symptoms):
+        """Convert symptom names to a 1-row CSR feature matrix, or None if none are known"""
+        symptom_indices = self.vocabulary.encode(symptoms)
+        if not symptom_indices:
+            return None
+        return csr_rows([symptom_indices], len(self.vocabulary))
+
+    def predict(self, X):
+        """Predict the disease name for a single (dense or 1-row sparse) feature vector"""
+        prediction = self.backend.predict(X if sparse.issparse(X) else [X])
+        return self.classes[int(prediction[0])]
+
+    def explain(self, disease):
+        """Return all symptoms associated with a disease"""
+        disease_id = self.vocabulary.disease_id(disease)
+        return list(self.vocabulary.disease_symptom_names(disease_id))
+
+    def confidence(self, symptoms, disease):
+        """Fraction of the disease's symptoms that were reported"""
+        return self.profile_scorer.coverage(self.vocabulary.disease_id(disease),
+                                           self.vocabulary.encode(symptoms))
+
+    # Doctor recommendations
+
+    def _set_directory(self, directory):
+        # Ranked doctors per class label, so results never search the directory
+        self._doctors = [directory.for_disease(disease) for disease in self.vocabulary.diseases]
+        self.directory = directory
+
+    def refresh_doctors(self):
+        """Reload the doctor directory if its files changed; return True if reloaded
+
+        Files that cannot be read keep the current directory (see reload).
+        """
+        if not self.directory.stale():
+            return False
+        directory = self.directory.reload()
+        if directory is self.directory:
+            return False
+        self._set_directory(directory)
+        return True
+
+    def recommend_doctor(self, disease):
+        """Return (name, link) of the best doctor for a disease, or (None, None)"""
+        doctor = self.directory.best(disease)
+        if doctor is None:
+            return None, None
+        return doctor.name, doctor.link
+
+    def _doctor_fields(self, doctors):
+        """Result entries for a ranked tuple of doctors"""
+        best = doctors[0] if doctors else None
+        return {
+            "doctor": best.name if best else None,
+            "doctor_link": best.link if best else None,
+            "doctors": [doctor._asdict() for doctor in doctors],
+        }
+
+    def result_for(self, disease, symptoms):
+        """Build the result dictionary for a diagnosed disease"""
+        result = {
+            "disease": disease,
+            "symptoms_present": symptoms,
+            "symptoms_given": self.explain(disease),
+            "confidence": self.confidence(symptoms, disease),
+        }
+        result.update(self._doctor_fields(self.directory.for_disease(disease)))
+        return result
+
+    def _result(self, label, confidence, differential, symptoms):
+        """Build the result dictionary for a predicted class label"""
+        result = {
+            "disease": self.classes[label],
+            "symptoms_present": symptoms,
+            "symptoms_given": list(self.vocabulary.disease_symptom_names(label)),
+            "confidence": confidence,
+        }
+        result.update(self._doctor_fields(self._doctors[label]))
+        if differential is not None:
+            result["probability"] = differential[0][1]
+            result["differential"] = [{"disease": self.vocabulary.diseases[label], "probability": probability}
+                                      for label, probability in differential]
+        return result
+
+    def _cache_key(self, key, top_k):
+        """Cache key for a symptom index set under the method that scores it"""
+        if top_k is not None:
+            return ('differential', top_k, key)
+        return key if self.method == METHOD_MODEL else (self.method, key)
+
+    def analyze(self, symptoms, top_k=None):
+        """Diagnose a list of symptom names, or return None if none are known
+
+        The diagnosis comes from the engine's method (model backend or bitset
+        profile similarity).  With ``top_k``, it comes from the calibrated
+        differential scorer instead and the result also carries "probability"
+        and a "differential" list of the top_k diseases with their probabilities.
+        """
+        symptom_indices = self._encode(symptoms)
+        if not symptom_indices:
+            METRICS.inc('analyze_no_known_symptoms')
+            return None
+
+        key = frozenset(symptom_indices)
+        cache_key = self._cache_key(key, top_k)
+        cached = self._cache_get(cache_key)
+        if cached is None:
+            cached = self._score(symptom_indices, top_k)
+            self.cache.put(cache_key, cached)
+        return self._result(*cached, symptoms)
+
+    def _score(self, symptom_indices, top_k):
+        """(label, confidence, differential) for one encoded symptom set"""
+        differential = None
+        if top_k is None and self.method == METHOD_PROFILE:
+            label = self.profile_scorer.best(symptom_indices)
+        elif top_k is None:
+            label = int(self.backend.predict_indices(symptom_indices))
+        else:
+            scorer = self.differential
+            probabilities = scorer.probabilities(scorer.logits_for(symptom_indices))
+            differential = tuple((int(label), float(probabilities[label]))
+                                 for label in scorer.top_k(probabilities, top_k)[0])
+            label = differential[0][0]
+        return label, self.profile_scorer.coverage(label, symptom_indices), differential
+
+    def analyze_many(self, symptom_lists, top_k=None):
+        """Diagnose many symptom lists with a single vectorized prediction
+
+        Returns one result dictionary per input, in order, with None for inputs
+        that contain no known symptoms (same as analyze, including ``top_k``).
+        """
+        with METRICS.time('analyze_many'):
+            return self._analyze_many(list(symptom_lists), top_k)
+
+    def _analyze_many(self, symptom_lists, top_k):
+        results = [None] * len(symptom_lists)
+
+        # Serve cached rows directly and collect the symptom indices of the
+        # rows that still need a prediction
+        miss_rows, miss_keys, miss_indices = [], [], []
+        for row, symptoms in enumerate(symptom_lists):
+            symptom_indices = self.vocabulary.encode(symptoms)
+            if not symptom_indices:
+                continue
+            key = frozenset(symptom_indices)
+            cached = self._cache_get(self._cache_key(key, top_k))
+            if cached is not None:
+                results[row] = self._result(*cached, symptoms)
+                continue
+            miss_indices.append(symptom_indices)
+            miss_rows.append(row)
+            miss_keys.append(key)
+        if not miss_rows:
+            return results
+
+        X = csr_rows(miss_indices, len(self.vocabulary))
+
+        # One predict call for the whole batch, then array lookups per class
+        with METRICS.time('predict_batch'):
+            predictions, confidence, differentials = self.score_rows(X, top_k)
+
+        for row, key, label, conf, differential in zip(miss_rows, miss_keys, predictions.tolist(),
+                                                       confidence.tolist(), differentials):
+            self.cache.put(self._cache_key(key, top_k), (label, conf, differential))
+            results[row] = self._result(label, conf, differential, symptom_lists[row])
+        return results
+
+    def score_rows(self, X, top_k=None):
+        """Score a (rows x symptoms) 0/1 matrix, dense or CSR, in one vectorized call
+
+        Returns (labels, confidence, differentials): class ids and profile
+        coverage as arrays, and per row the ((label, probability), ...) top_k
+        differential, or None without ``top_k``.  Rows should contain at least
+        one symptom; no cache is consulted.
+        """
+        differentials = [None] * X.shape[0]
+        if top_k is None and self.method == METHOD_PROFILE:
+            predictions = self.profile_scorer.best_many(X)
+        elif top_k is None:
+            predictions = self.backend.predict(X)
+        else:
+            scorer = self.differential
+            probabilities = scorer.probabilities(scorer.logits(X))
+            best = scorer.top_k(probabilities, top_k)
+            predictions = best[:, 0]
+            best_probabilities = np.take_along_axis(probabilities, best, axis=1)
+            differentials = [tuple(zip(labels, probs))
+                             for labels, probs in zip(best.tolist(), best_probabilities.tolist())]
+        return predictions, self.profile_scorer.coverage_many(predictions, X), differentials
+
+    # Traditional question-and-answer walk over the compiled decision tree
+
+    def question(self, node):
+        """Return the symptom asked at a tree node, or None at a leaf"""
+        return self.flow.question(node)
+
+    def next_node(self, node, answer):
+        """Follow the yes (True) or no (False) branch from a tree node"""
+        return self.flow.next_node(node, answer)
+
+    def leaf_disease(self, node):
+        """Return the disease resolved at a leaf node"""
+        return self.flow.leaf_disease(node)
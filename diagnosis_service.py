@@ -0,0 +1,370 @@
+"""Local HTTP/JSON diagnosis service.
+
+An asyncio front end parses requests and hands all model work to a pre-forked
+process pool; every worker loads the DiagnosisEngine once at start-up, so the
+front-end process never imports scikit-learn.
+
+Endpoints (JSON bodies, JSON responses):
+
+    GET  /health
+    GET  /metrics        stage timings and counters, Prometheus text format
+    POST /analyze        {"symptoms": [...], "top_k": 3}
+    POST /analyze_many   {"symptom_lists": [[...], ...], "top_k": 3}
+    POST /match          {"query": "...", "n": 3, "cutoff": 0.6}
+    POST /qa/step        {"token": "..."|null, "answer": true|false|null}
+    POST /cases          {"cases": [{"symptoms": [...], "disease": "..."}, ...]}
+
+/analyze returns the same result dictionary as HealthcareChatbot.analyze_symptoms.
+"top_k" is optional; when given, results include the calibrated differential.
+/qa/step is stateless: the returned token carries the whole session, so any
+worker (or any service instance with the same model) can continue it.
+/cases stores confirmed cases in the delta store (see model_updates.py).  Each
+worker checks the store at most every MODEL_REFRESH_SECONDS and folds new
+cases into its model on a background thread, while requests keep being served
+by the previous model.
+
+Run ``python diagnosis_service.py --port 8080`` to serve on localhost; add
+``--method profile`` to diagnose by bitset profile similarity instead of the
+model backend, and ``--metrics`` (or DIAGNOSIS_DEBUG=1) to collect /metrics.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from metrics import METRICS
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Seconds between checks of the doctor directory files in each worker
+DOCTOR_REFRESH_SECONDS = 30
+
+# Seconds between checks of the delta store for new cases in each worker
+MODEL_REFRESH_SECONDS = 5
+
+# Worker-process state, set up once by _init_worker
+_engine = None
+_updater = None
+_next_doctor_check = 0.0
+_next_model_check = 0.0
+
+
+def _init_worker(method, metrics_enabled):
+    """Load the model once in each pool worker"""
+    global _engine, _updater
+    from model_updates import load_updater
+    METRICS.enabled = metrics_enabled
+    _updater = load_updater(method=method)
+    _engine = _updater.engine
+    METRICS.reset()
+
+
+def _refresh_model():
+    """Fold newly stored cases into this worker's model (runs on its own thread)"""
+    global _engine
+    if _updater.refresh():
+        _engine = _updater.engine
+
+
+def _start_model_refresh():
+    threading.Thread(target=_refresh_model, name="model-update", daemon=True).start()
+
+
+def _call(func, *args):
+    """Run a task and hand the worker's new metrics back to the front end"""
+    global _next_doctor_check, _next_model_check
+    now = time.monotonic()
+    if now >= _next_doctor_check:
+        _next_doctor_check = now + DOCTOR_REFRESH_SECONDS
+        _engine.refresh_doctors()
+    if now >= _next_model_check:
+        _next_model_check = now + MODEL_REFRESH_SECONDS
+        if _updater.pending():
+            _start_model_refresh()
+    return func(*args), METRICS.drain()
+
+
+def _content_length(headers):
+    """The Content-Length header as an int (0 if absent), or None if it is not
+    a non-negative decimal integer"""
+    value = headers.get('content-length', '')
+    if not value:
+        return 0
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+def _jsonable(result):
+    """Convert a result dictionary to plain JSON types"""
+    if result is None:
+        return None
+    result = dict(result)
+    result["disease"] = str(result["disease"])
+    return result
+
+
+def _ping():
+    return os.getpid()
+
+
+def _analyze(symptoms, top_k):
+    return _jsonable(_engine.analyze(symptoms, top_k))
+
+
+def _analyze_many(symptom_lists, top_k):
+    return [_jsonable(result) for result in _engine.analyze_many(symptom_lists, top_k)]
+
+
+def _match(query, n, cutoff):
+    return [{"symptom": symptom, "score": score}
+            for symptom, score in _engine.matcher.match(query, n=n, cutoff=cutoff)]
+
+
+def _qa_step(token, answer):
+    """Start or advance a token-encoded Q&A session by one answer"""
+    codec = _engine.qa_tokens
+    if token is None:
+        token = codec.start()
+    elif answer is not None:
+        token = codec.step(token, answer)
+
+    state = codec.view(token)
+    diagnosis = None
+    if state["question"] is None:
+        diagnosis = _jsonable(_engine.result_for(state["disease"], state["symptoms_present"]))
+    return {
+        "token": token,
+        "question": state["question"],
+        "symptoms_present": state["symptoms_present"],
+        "diagnosis": diagnosis,
+    }
+
+
+def _add_cases(cases):
+    """Store confirmed cases and start folding them into this worker's model"""
+    added = _updater.add(cases)
+    _start_model_refresh()
+    return {"added": added}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _field(body, name, kind, default=None):
+    """Fetch and type-check a field of the request body"""
+    value = body.get(name, default)
+    if not isinstance(value, kind):
+        raise BadRequest(f"'{name}' must be of type {kind.__name__ if isinstance(kind, type) else kind}")
+    return value
+
+
+def _top_k(body):
+    top_k = body.get("top_k")
+    if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+        raise BadRequest("'top_k' must be a positive integer or null")
+    return top_k
+
+
+def _string_list(value, name):
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise BadRequest(f"'{name}' must be a list of strings")
+    return value
+
+
+class DiagnosisService:
+    def __init__(self, workers=None, method='model'):
+        self.workers = workers or os.cpu_count() or 1
+        self.method = method
+        self.pool = None
+        self.server = None
+        # Requests still waiting on the pool, cancelled on close
+        self.pending = set()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Fork and warm up the worker pool, then start listening"""
+        from qa_token import token_secret
+
+        # Create the Q&A token key, if there is none yet, before the workers read it
+        token_secret()
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.method, METRICS.enabled))
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future in list(self.pending):
+                future.cancel()
+            self.pool.shutdown()
+
+    async def run_in_pool(self, func, *args):
+        with METRICS.time('request'):
+            future = self.pool.submit(_call, func, *args)
+            self.pending.add(future)
+            future.add_done_callback(self.pending.discard)
+            result, worker_metrics = await asyncio.wrap_future(future)
+        METRICS.merge(worker_metrics)
+        return result
+
+    async def dispatch(self, method, path, body):
+        """Route a request and return (status, payload)"""
+        if path == '/health':
+            return HTTPStatus.OK, {"status": "ok", "workers": self.workers, "method": self.method}
+        if path == '/metrics':
+            return HTTPStatus.OK, METRICS.prometheus()
+
+        routes = {
+            '/analyze': self.analyze,
+            '/analyze_many': self.analyze_many,
+            '/match': self.match,
+            '/qa/step': self.qa_step,
+            '/cases': self.cases,
+        }
+        handler = routes.get(path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {"error": "not found"}
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST"}
+        return HTTPStatus.OK, await handler(body)
+
+    async def analyze(self, body):
+        symptoms = _string_list(body.get("symptoms"), "symptoms")
+        return await self.run_in_pool(_analyze, symptoms, _top_k(body))
+
+    async def analyze_many(self, body):
+        symptom_lists = body.get("symptom_lists")
+        if not isinstance(symptom_lists, list):
+            raise BadRequest("'symptom_lists' must be a list")
+        symptom_lists = [_string_list(symptoms, "symptom_lists") for symptoms in symptom_lists]
+        return await self.run_in_pool(_analyze_many, symptom_lists, _top_k(body))
+
+    async def match(self, body):
+        query = _field(body, "query", str)
+        n = body.get("n", 3)
+        if not isinstance(n, int) or isinstance(n, bool) or n < 1:
+            raise BadRequest("'n' must be a positive integer")
+        cutoff = body.get("cutoff", 0.6)
+        if not isinstance(cutoff, (int, float)) or isinstance(cutoff, bool) or not 0.0 <= cutoff <= 1.0:
+            raise BadRequest("'cutoff' must be a number between 0 and 1")
+        return await self.run_in_pool(_match, query, n, float(cutoff))
+
+    async def qa_step(self, body):
+        token = body.get("token")
+        if token is not None and not isinstance(token, str):
+            raise BadRequest("'token' must be a string or null")
+        answer = body.get("answer")
+        if answer is not None and not isinstance(answer, bool):
+            raise BadRequest("'answer' must be true, false or null")
+        try:
+            return await self.run_in_pool(_qa_step, token, answer)
+        except ValueError as e:
+            raise BadRequest(str(e))
+
+    async def cases(self, body):
+        cases = body.get("cases")
+        if not isinstance(cases, list) or not all(isinstance(case, dict) for case in cases):
+            raise BadRequest("'cases' must be a list of objects")
+        cases = [(_string_list(case.get("symptoms"), "symptoms"), _field(case, "disease", str))
+                 for case in cases]
+        return await self.run_in_pool(_add_cases, cases)
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it is closed"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "bad request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                length = _content_length(headers)
+                if length is None:
+                    # Without a valid length the body cannot be skipped, so close
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "bad Content-Length"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "body too large"}, False)
+                    break
+                raw = await reader.readexactly(length) if length else b''
+
+                try:
+                    body = json.loads(raw) if raw else {}
+                    if not isinstance(body, dict):
+                        raise BadRequest("body must be a JSON object")
+                    status, payload = await self.dispatch(method, target.split('?', 1)[0], body)
+                except (BadRequest, ValueError) as e:
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            data, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+
+async def serve(host, port, workers, method):
+    service = DiagnosisService(workers, method)
+    server = await service.start(host, port)
+    print(f"Diagnosis service on http://{host}:{port} with {service.workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP diagnosis service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--method', choices=('model', 'profile'), default='model')
+    parser.add_argument('--metrics', action='store_true', help="collect stage timings for /metrics")
+    args = parser.parse_args()
+    if args.metrics:
+        METRICS.enabled = True
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.method))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,102 @@
+"""Top-k differential diagnosis with calibrated probabilities.
+
+A Bayesian scorer over the per-disease symptom statistics of Training.csv.
+Only reported symptoms count as evidence: a patient who types two symptoms has
+not denied the others, so each disease is scored by the smoothed likelihood of
+the reported symptoms under it.  The softmax temperature is fitted on held-out
+rows with random subsets of their symptoms (what patients actually type), so
+the returned probabilities are calibrated rather than 0/1 tree votes.
+"""
+import numpy as np
+from scipy import sparse
+
+from sparse_symptoms import as_csr, csr_rows, label_sums, row_positives
+
+DEFAULT_TOP_K = 3
+
+
+def partial_samples(X, y, rng, max_symptoms=5):
+    """Keep 1..max_symptoms random positive symptoms of each row
+
+    X may be dense or sparse; the samples are returned as a CSR matrix.
+    """
+    X = as_csr(X)
+    kept, keep = [], []
+    for row in range(X.shape[0]):
+        positives = row_positives(X, row)
+        if len(positives) == 0:
+            continue
+        k = rng.integers(1, min(max_symptoms, len(positives)) + 1)
+        kept.append(np.sort(rng.choice(positives, k, replace=False)))
+        keep.append(row)
+    return csr_rows(kept, X.shape[1]), np.asarray(y)[keep]
+
+
+class DifferentialScorer:
+    def __init__(self, counts, totals, alpha=1.0, temperature=1.0):
+        """Score diseases from per-disease symptom counts and row totals
+
+        ``alpha`` is the Laplace smoothing added to each count.
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        totals = np.asarray(totals, dtype=np.float64)
+        self.counts = counts
+        self.totals = totals
+        self.alpha = alpha
+        self.log_likelihood = np.log((counts + alpha) / (totals[:, None] + 2 * alpha))
+        self.log_prior = np.log(totals / totals.sum())
+        self.temperature = temperature
+
+    def updated(self, X, y):
+        """A new scorer with the labeled rows (X, y) added to the counts
+
+        The calibrated temperature is kept; new cases shift the likelihoods
+        but rarely the right amount of softmax sharpening.
+        """
+        counts = self.counts + label_sums(X, y, len(self.totals))
+        totals = self.totals + np.bincount(y, minlength=len(self.totals))
+        return DifferentialScorer(counts, totals, self.alpha, self.temperature)
+
+    def symptom_probabilities(self):
+        """(diseases x symptoms) smoothed probability of each symptom given each disease"""
+        return np.exp(self.log_likelihood)
+
+    def logits(self, X):
+        """Unnormalized log-posterior of every disease for each (dense or sparse) row of X"""
+        if sparse.issparse(X):
+            return np.asarray(X.astype(np.float64) @ self.log_likelihood.T) + self.log_prior
+        return np.asarray(X, dtype=np.float64) @ self.log_likelihood.T + self.log_prior
+
+    def logits_for(self, symptom_indices):
+        """Log-posterior of every disease for one list of symptom indices"""
+        return self.log_likelihood[:, list(symptom_indices)].sum(axis=1) + self.log_prior
+
+    def probabilities(self, logits):
+        """Temperature-scaled softmax over diseases"""
+        logits = np.asarray(logits) / self.temperature
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        weights = np.exp(logits)
+        return weights / weights.sum(axis=-1, keepdims=True)
+
+    def top_k(self, probabilities, k=DEFAULT_TOP_K):
+        """Indices of the k most probable diseases per row, best first"""
+        probabilities = np.atleast_2d(probabilities)
+        k = min(k, probabilities.shape[1])
+        best = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(probabilities, best, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(best, order, axis=1)
+
+    def calibrate(self, X, y, grid=None):
+        """Fit the softmax temperature by minimizing negative log-likelihood"""
+        if grid is None:
+            grid = np.exp(np.linspace(np.log(0.05), np.log(20), 60))
+        logits = self.logits(X)
+        rows = np.arange(len(y))
+        best, best_nll = self.temperature, np.inf
+        for temperature in grid:
+            self.temperature = temperature
+            nll = -np.log(self.probabilities(logits)[rows, y] + 1e-12).mean()
+            if nll < best_nll:
+                best, best_nll = temperature, nll
+        self.temperature = float(best)
+        return self.temperature
@@ -0,0 +1,175 @@
+"""In-memory doctor directory keyed by disease and specialty.
+
+doctors_dataset.csv has one doctor per disease, matched to the diseases by row
+position (sorted disease order), with the specialty encoded in the profile
+link.  More doctors can be listed in doctor_directory.csv:
+
+    name,link,specialty,diseases,rating
+    Dr. A,https://...,Dermatologist,Acne;Psoriasis,4.8
+
+Doctors for a disease are ranked by rating, best first, and topped up with
+other doctors of the same specialty when a disease has fewer than requested.
+All lookups are dictionary reads prepared at load time; reload() rebuilds the
+index when either file changes, without restarting the app.  Rows that
+cannot be parsed are skipped with a warning, and a reload that fails keeps the
+previous directory.
+"""
+import csv
+import logging
+import os
+from collections import namedtuple
+from urllib.parse import parse_qs, urlparse
+
+DOCTORS_CSV = 'doctors_dataset.csv'
+DIRECTORY_CSV = 'doctor_directory.csv'
+
+# Doctors returned per diagnosis
+DEFAULT_CANDIDATES = 3
+
+Doctor = namedtuple('Doctor', ['name', 'link', 'specialty', 'rating'])
+
+log = logging.getLogger(__name__)
+
+
+def specialty_from_link(link):
+    """Read the specialization query parameter of a practo.com profile link"""
+    values = parse_qs(urlparse(link).query).get('specialization')
+    return values[0].strip() if values else None
+
+
+def read_legacy(path, diseases):
+    """(disease, Doctor) pairs from the positional doctors_dataset.csv"""
+    with open(path, newline='', encoding='utf-8') as file:
+        rows = [row for row in csv.reader(file) if row]
+    entries = []
+    for line, (disease, row) in enumerate(zip(diseases, rows), start=1):
+        if len(row) < 2 or not row[0].strip():
+            log.warning("Skipping %s row %d: expected a name and a link", path, line)
+            continue
+        entries.append((disease, Doctor(row[0].strip(), row[1].strip(), specialty_from_link(row[1]), 0.0)))
+    return entries
+
+
+def read_directory(path):
+    """(disease, Doctor) pairs from doctor_directory.csv"""
+    entries = []
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            # A malformed or half-written row loses that doctor, not the file
+            name = (row.get('name') or '').strip()
+            link = (row.get('link') or '').strip()
+            try:
+                rating = float(row.get('rating') or 0)
+            except (TypeError, ValueError):
+                rating = None
+            if not name or rating is None:
+                log.warning("Skipping %s line %d: %s", path, reader.line_num,
+                            "no name" if not name else f"bad rating {row.get('rating')!r}")
+                continue
+            specialty = (row.get('specialty') or '').strip() or specialty_from_link(link)
+            doctor = Doctor(name, link, specialty, rating)
+            for disease in (row.get('diseases') or '').split(';'):
+                if disease.strip():
+                    entries.append((disease.strip(), doctor))
+    return entries
+
+
+class DoctorDirectory:
+    def __init__(self, entries, candidates=DEFAULT_CANDIDATES, diseases=(), sources=None, mtimes=None):
+        """Index (disease, Doctor) pairs
+
+        ``candidates`` is how many doctors are prepared per disease.
+        ``sources`` are the files the entries were read from, with their
+        modification times when read, so stale() can tell they changed.
+        """
+        self.candidates = candidates
+        self.diseases = tuple(diseases)
+        self.sources = sources
+        self.mtimes = mtimes
+        by_disease = {}
+        by_specialty = {}
+        for disease, doctor in entries:
+            doctors = by_disease.setdefault(disease, [])
+            if doctor not in doctors:
+                doctors.append(doctor)
+            if doctor.specialty:
+                doctors = by_specialty.setdefault(doctor.specialty, [])
+                if doctor not in doctors:
+                    doctors.append(doctor)
+
+        # Stable sorts keep file order between equally rated doctors
+        def ranked(doctors):
+            return tuple(sorted(doctors, key=lambda doctor: -doctor.rating))
+
+        self._by_specialty = {specialty: ranked(doctors) for specialty, doctors in by_specialty.items()}
+        self._direct = {disease: ranked(doctors) for disease, doctors in by_disease.items()}
+
+        # Per disease: its own doctors, then others of the same specialties
+        self._by_disease = {}
+        for disease, direct in self._direct.items():
+            chosen = list(direct)
+            for specialty in dict.fromkeys(doctor.specialty for doctor in direct if doctor.specialty):
+                if len(chosen) >= candidates:
+                    break
+                chosen.extend(doctor for doctor in self._by_specialty[specialty] if doctor not in chosen)
+            self._by_disease[disease] = tuple(chosen[:max(candidates, len(direct))])
+
+    @classmethod
+    def load(cls, diseases, doctors_csv=DOCTORS_CSV, directory_csv=DIRECTORY_CSV, **kwargs):
+        """Build the directory from the legacy file and the optional directory file"""
+        sources = (doctors_csv, directory_csv)
+        # Taken before reading, so an edit made while reading is picked up later
+        mtimes = _mtimes(sources)
+        entries = read_legacy(doctors_csv, diseases) if os.path.exists(doctors_csv) else []
+        if directory_csv and os.path.exists(directory_csv):
+            entries += read_directory(directory_csv)
+        return cls(entries, diseases=diseases, sources=sources, mtimes=mtimes, **kwargs)
+
+    def stale(self):
+        """True if a source file was added, changed or removed since loading"""
+        return self.sources is not None and _mtimes(self.sources) != self.mtimes
+
+    def reload(self):
+        """Return a freshly loaded directory from the same files
+
+        If they cannot be read, the error is logged and this directory is
+        returned instead, and kept until the files change again.
+        """
+        mtimes = _mtimes(self.sources)
+        try:
+            return type(self).load(self.diseases, *self.sources, candidates=self.candidates)
+        except (OSError, csv.Error, ValueError) as e:
+            log.warning("Keeping the previous doctor directory, could not reload it: %s", e)
+            self.mtimes = mtimes
+            return self
+
+    def __len__(self):
+        return len(self._direct)
+
+    def for_disease(self, disease, n=None):
+        """Ranked doctors for a disease, including same-specialty fallbacks"""
+        doctors = self._by_disease.get(disease, ())
+        return doctors if n is None else doctors[:n]
+
+    def best(self, disease):
+        """The top-ranked doctor for a disease, or None"""
+        doctors = self._by_disease.get(disease)
+        return doctors[0] if doctors else None
+
+    def for_specialty(self, specialty, n=None):
+        """Ranked doctors of a specialty"""
+        doctors = self._by_specialty.get(specialty, ())
+        return doctors if n is None else doctors[:n]
+
+    def specialties(self, disease=None):
+        """All specialties, or those of the doctors listed for a disease"""
+        if disease is None:
+            return sorted(self._by_specialty)
+        return list(dict.fromkeys(doctor.specialty for doctor in self._direct.get(disease, ())
+                                  if doctor.specialty))
+
+
+def _mtimes(paths):
+    return tuple(os.stat(path).st_mtime_ns if path and os.path.exists(path) else None
+                 for path in paths)
@@ -1,14 +1,10 @@
 from tkinter import *
 from tkinter import ttk, messagebox, scrolledtext
-import os
 import webbrowser
-import numpy as np
-import pandas as pd
 from PIL import Image, ImageTk
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.tree import DecisionTreeClassifier, _tree
-from difflib import get_close_matches
+from diagnosis_engine import DiagnosisEngine
+from session_manager import SessionManager
+from user_store import AUTH_BAD_PASSWORD, AUTH_OK, UserStore
 
 # Modern color scheme
 DARK_BLUE = "#0A2463"
@@ -49,35 +45,20 @@ class HyperlinkManager:
 
 class HealthcareChatbot:
     def __init__(self):
-        # Load datasets
-        self.training_dataset = pd.read_csv('Training.csv')
-        self.test_dataset = pd.read_csv('Testing.csv')
-        
-        # Prepare data
-        self.X = self.training_dataset.iloc[:, 0:132].values
-        self.Y = self.training_dataset.iloc[:, -1].values
-        
-        # Dimensionality reduction
-        self.dimensionality_reduction = self.training_dataset.groupby(self.training_dataset['prognosis']).max()
-        
-        # Encode labels
-        self.labelencoder = LabelEncoder()
-        self.y = self.labelencoder.fit_transform(self.Y)
-        
-        # Train classifier
-        self.classifier = DecisionTreeClassifier()
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            self.X, self.y, test_size=0.25, random_state=0)
-        self.classifier.fit(self.X_train, self.y_train)
+        # Load the headless diagnosis engine
+        self.engine = DiagnosisEngine.load()
         
         # Prepare symptom list
-        self.cols = self.training_dataset.columns[:-1]
-        self.all_symptoms = list(self.cols)
+        self.cols = self.engine.cols
+        self.all_symptoms = self.engine.all_symptoms
+        
+        # Credential store; old per-user files are imported in the background
+        self.users = UserStore()
+        self.users.start_legacy_migration()
         
-        # Load doctors data
-        self.doctors = pd.read_csv('doctors_dataset.csv', names=['Name', 'Description'])
-        self.diseases = pd.DataFrame(self.dimensionality_reduction.index)
-        self.doctors['disease'] = self.diseases['prognosis']
+        # The patient's symptoms and Q&A walk
+        self.sessions = SessionManager(self.engine, idle_timeout=None)
+        self.session_id = self.sessions.create().session_id
         
         # Initialize GUI
         self.root = Tk()
@@ -233,15 +214,12 @@ class HealthcareChatbot:
             messagebox.showerror("Error", "Please enter both username and password")
             return
             
-        list_of_files = os.listdir()
-        if username in list_of_files:
-            with open(username, "r") as file:
-                verify = file.read().splitlines()
-                if password in verify:
-                    messagebox.showinfo("Success", "Login Successful")
-                    self.show_chatbot()
-                else:
-                    messagebox.showerror("Error", "Incorrect password")
+        status = self.users.authenticate(username, password)
+        if status == AUTH_OK:
+            messagebox.showinfo("Success", "Login Successful")
+            self.show_chatbot()
+        elif status == AUTH_BAD_PASSWORD:
+            messagebox.showerror("Error", "Incorrect password")
         else:
             messagebox.showerror("Error", "User not found. Please register.")
     
@@ -254,12 +232,9 @@ class HealthcareChatbot:
             messagebox.showerror("Error", "Please enter both username and password")
             return
             
-        if username in os.listdir():
+        if not self.users.register(username, password):
             messagebox.showerror("Error", "Username already exists")
             return
-            
-        with open(username, "w") as file:
-            file.write(f"{username}\n{password}")
         
         messagebox.showinfo("Success", "Registration successful")
         self.show_chatbot()
@@ -330,8 +305,8 @@ class HealthcareChatbot:
         ttk.Button(control_frame, text="Logout", 
                   command=self.create_main_page).pack(side=RIGHT, padx=5)
         
-        # Initialize symptom list
-        self.user_symptoms = []
+        # Start with an empty symptom list
+        self.sessions.clear_symptoms(self.session_id)
     
     def add_symptom(self):
         """Add symptom to the list after fuzzy matching"""
@@ -340,12 +315,11 @@ class HealthcareChatbot:
             return
             
         # Find closest match in our symptom list
-        matches = get_close_matches(symptom, self.all_symptoms, n=1, cutoff=0.6)
+        matched_symptom = self.engine.matcher.best(symptom, cutoff=0.6)
         
-        if matches:
-            matched_symptom = matches[0]
-            if matched_symptom not in self.user_symptoms:
-                self.user_symptoms.append(matched_symptom)
+        if matched_symptom:
+            if matched_symptom not in self.sessions.symptoms(self.session_id):
+                self.sessions.add_symptom(self.session_id, matched_symptom)
                 self.selected_symptoms_text.insert(END, f"- {matched_symptom}\n")
                 self.symptom_entry.delete(0, END)
                 messagebox.showinfo("Info", f"Added symptom: {matched_symptom}")
@@ -356,69 +330,53 @@ class HealthcareChatbot:
     
     def analyze_symptoms(self):
         """Analyze the entered symptoms and provide diagnosis"""
-        if not self.user_symptoms:
+        if not self.sessions.symptoms(self.session_id):
             messagebox.showwarning("Warning", "Please add at least one symptom")
             return
             
         self.diagnosis_text.delete(1.0, END)
         
         try:
-            # Convert symptoms to feature vector
-            symptom_indices = [self.all_symptoms.index(symptom) for symptom in self.user_symptoms 
-                            if symptom in self.all_symptoms]
+            result = self.sessions.analyze(self.session_id)
             
-            if not symptom_indices:
+            if result is None:
                 self.diagnosis_text.insert(END, "No valid symptoms found for analysis")
                 return
-                
-            # Create feature vector
-            X = np.zeros(len(self.all_symptoms))
-            for idx in symptom_indices:
-                X[idx] = 1
-                
-            # Predict disease
-            prediction = self.classifier.predict([X])
-            disease = self.labelencoder.inverse_transform(prediction)[0]
-            
-            # Get disease info - exactly like original console version
-            self.diagnosis_text.insert(END, "You may have " + str(disease) + "\n\n")
             
-            # Get all symptoms for this disease - fixed implementation
-            disease_data = self.dimensionality_reduction.loc[disease]
-            symptoms_given = [col for col, val in zip(self.cols, disease_data) if val == 1]
-            
-            # Display symptoms present - exactly like original
-            self.diagnosis_text.insert(END, "symptoms present  " + str(self.user_symptoms) + "\n\n")
-            
-            # Display all related symptoms - exactly like original
-            self.diagnosis_text.insert(END, "symptoms given " + str(symptoms_given) + "\n\n")
-            
-            # Calculate confidence level - fixed implementation
-            if len(symptoms_given) > 0:
-                confidence_level = len(set(self.user_symptoms) & set(symptoms_given)) / len(symptoms_given)
-                self.diagnosis_text.insert(END, "confidence level is " + str(confidence_level) + "\n\n")
-            else:
-                self.diagnosis_text.insert(END, "confidence level is 0.0\n\n")
-            
-            # Doctor recommendation - exactly like original
-            self.diagnosis_text.insert(END, "The model suggests:\n\n")
-            row = self.doctors[self.doctors['disease'] == disease]
-            
-            if not row.empty:
-                self.diagnosis_text.insert(END, "Consult " + str(row['Name'].values[0]) + "\n\n")
-                
-                # Add clickable link
-                hyperlink = HyperlinkManager(self.diagnosis_text)
-                def click1():
-                    webbrowser.open_new(str(row['Description'].values[0]))
-                self.diagnosis_text.insert(END, "Visit ", hyperlink.add(click1))
-                self.diagnosis_text.insert(END, str(row['Description'].values[0]) + "\n")
-            else:
-                self.diagnosis_text.insert(END, "No doctor recommendation available for this condition\n")
+            self.show_result(self.diagnosis_text, result)
                 
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred during diagnosis: {str(e)}")
             self.diagnosis_text.insert(END, f"Error: {str(e)}\n")
+    
+    def show_result(self, text, result):
+        """Render a diagnosis result in the original console format"""
+        # Get disease info - exactly like original console version
+        text.insert(END, "You may have " + str(result['disease']) + "\n\n")
+        
+        # Display symptoms present - exactly like original
+        text.insert(END, "symptoms present  " + str(result['symptoms_present']) + "\n\n")
+        
+        # Display all related symptoms - exactly like original
+        text.insert(END, "symptoms given " + str(result['symptoms_given']) + "\n\n")
+        
+        # Confidence level
+        text.insert(END, "confidence level is " + str(result['confidence']) + "\n\n")
+        
+        # Doctor recommendation - exactly like original
+        text.insert(END, "The model suggests:\n\n")
+        
+        if result['doctor']:
+            text.insert(END, "Consult " + str(result['doctor']) + "\n\n")
+            
+            # Add clickable link
+            hyperlink = HyperlinkManager(text)
+            def click1():
+                webbrowser.open_new(str(result['doctor_link']))
+            text.insert(END, "Visit ", hyperlink.add(click1))
+            text.insert(END, str(result['doctor_link']) + "\n")
+        else:
+            text.insert(END, "No doctor recommendation available for this condition\n")
             
     def show_traditional_diagnosis(self):
         """Show the traditional yes/no question diagnosis"""
@@ -462,14 +420,14 @@ class HealthcareChatbot:
         ttk.Button(control_frame, text="Back", command=self.show_chatbot).pack(side=RIGHT, padx=5)
         
         # Initialize diagnosis
-        self.symptoms_present = []
-        self.current_node = 0
+        self.sessions.restart_qa(self.session_id)
         self.ask_question()
     
     def ask_question(self):
         """Ask the next question in the decision tree"""
-        if self.classifier.tree_.feature[self.current_node] != _tree.TREE_UNDEFINED:
-            question = self.cols[self.classifier.tree_.feature[self.current_node]] + "?"
+        symptom = self.sessions.question(self.session_id)
+        if symptom is not None:
+            question = symptom + "?"
             self.question_text.delete(1.0, END)
             self.question_text.insert(END, question)
         else:
@@ -477,62 +435,21 @@ class HealthcareChatbot:
     
     def answer_yes(self):
         """Process yes answer"""
-        self.symptoms_present.append(self.cols[self.classifier.tree_.feature[self.current_node]])
-        self.current_node = self.classifier.tree_.children_right[self.current_node]
+        self.sessions.answer(self.session_id, True)
         self.ask_question()
     
     def answer_no(self):
         """Process no answer"""
-        self.current_node = self.classifier.tree_.children_left[self.current_node]
+        self.sessions.answer(self.session_id, False)
         self.ask_question()
     
-    def print_disease(self, node):
-        """Print disease from node value (matches original console version)"""
-        node = node[0]
-        val = node.nonzero() 
-        disease = self.labelencoder.inverse_transform(val[0])
-        return disease
-    
     def provide_diagnosis(self):
         """Provide final diagnosis in traditional format"""
         try:
-            present_disease = self.print_disease(self.classifier.tree_.value[self.current_node])
+            result = self.sessions.qa_result(self.session_id)
             
             self.response_text.delete(1.0, END)
-            self.response_text.insert(END, "You may have " + str(present_disease) + "\n\n")
-            
-            # Get all symptoms for this disease - fixed implementation
-            disease_data = self.dimensionality_reduction.loc[present_disease]
-            symptoms_given = [col for col, val in zip(self.cols, disease_data) if val == 1]
-            
-            # Display symptoms present - exactly like original
-            self.response_text.insert(END, "symptoms present  " + str(self.symptoms_present) + "\n\n")
-            
-            # Display all related symptoms - exactly like original
-            self.response_text.insert(END, "symptoms given " + str(symptoms_given) + "\n\n")
-            
-            # Calculate confidence level - fixed implementation
-            if len(symptoms_given) > 0:
-                confidence_level = len(set(self.symptoms_present) & set(symptoms_given)) / len(symptoms_given)
-                self.response_text.insert(END, "confidence level is " + str(confidence_level) + "\n\n")
-            else:
-                self.response_text.insert(END, "confidence level is 0.0\n\n")
-            
-            # Doctor recommendation - exactly like original
-            self.response_text.insert(END, "The model suggests:\n\n")
-            row = self.doctors[self.doctors['disease'] == present_disease[0]]
-            
-            if not row.empty:
-                self.response_text.insert(END, "Consult " + str(row['Name'].values[0]) + "\n\n")
-                
-                # Add clickable link
-                hyperlink = HyperlinkManager(self.response_text)
-                def click1():
-                    webbrowser.open_new(str(row['Description'].values[0]))
-                self.response_text.insert(END, "Visit ", hyperlink.add(click1))
-                self.response_text.insert(END, str(row['Description'].values[0]) + "\n")
-            else:
-                self.response_text.insert(END, "No doctor recommendation available for this condition\n")
+            self.show_result(self.response_text, result)
                 
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred during diagnosis: {str(e)}")
@@ -544,7 +461,7 @@ class HealthcareChatbot:
     
     def clear_symptoms(self):
         """Clear all entered symptoms"""
-        self.user_symptoms = []
+        self.sessions.clear_symptoms(self.session_id)
         self.selected_symptoms_text.delete(1.0, END)
         self.diagnosis_text.delete(1.0, END)
     
@@ -0,0 +1,171 @@
+"""Lightweight stage timers, histograms and counters for the diagnosis path.
+
+Instrumented code uses the shared METRICS registry:
+
+    with METRICS.time('render'):
+        ...
+    METRICS.inc('cache_hits')
+
+While the registry is disabled, time() returns a shared no-op context manager
+and inc() returns immediately.  Per-request hot paths go further and only wrap
+their stage functions with timed() when the registry is enabled as they are
+built, so they run untouched otherwise.  Set DIAGNOSIS_DEBUG=1 to enable it at
+start-up; the GUI then shows the last stage timings in its status bar, and the
+HTTP service exports everything as Prometheus text on GET /metrics.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget every observation"""
+        with self._lock:
+            # stage -> [per-bucket counts (last one is +Inf), sum, count]
+            self._histograms = {}
+            self._counters = {}
+            self.last = {}
+
+    def time(self, stage):
+        """Context manager that records the duration of a stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def timed(self, stage, func):
+        """Wrap func so that every call is recorded under stage"""
+        observe = self.observe
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, clock() - start)
+        return wrapper
+
+    def observe(self, stage, seconds):
+        """Record one duration of a stage"""
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            self.last[stage] = seconds
+
+    def inc(self, name, amount=1):
+        """Increase a counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """Copy of the current histograms, counters and last durations"""
+        with self._lock:
+            return {
+                "histograms": {stage: [list(counts), total, count]
+                               for stage, (counts, total, count) in self._histograms.items()},
+                "counters": dict(self._counters),
+                "last": dict(self.last),
+            }
+
+    def drain(self):
+        """Return a snapshot and reset, or None when disabled"""
+        if not self.enabled:
+            return None
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot taken from another registry, e.g. a worker process"""
+        if not snapshot:
+            return
+        with self._lock:
+            for stage, (counts, total, count) in snapshot["histograms"].items():
+                histogram = self._histograms.get(stage)
+                if histogram is None:
+                    histogram = self._histograms[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+                histogram[2] += count
+            for name, value in snapshot["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            self.last.update(snapshot["last"])
+
+    def status_line(self, stages=None):
+        """Last duration of each stage in milliseconds, for the status bar"""
+        last = dict(self.last)
+        names = stages if stages is not None else sorted(last)
+        return " | ".join(f"{stage} {last[stage] * 1e3:.2f} ms" for stage in names if stage in last)
+
+    def prometheus(self, prefix='diagnosis'):
+        """Render every histogram and counter in the Prometheus text format"""
+        snapshot = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_seconds Time spent in each diagnosis stage",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+        for stage, (counts, total, count) in sorted(snapshot["histograms"].items()):
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines += [f"# HELP {prefix}_events_total Diagnosis events by kind",
+                  f"# TYPE {prefix}_events_total counter"]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry for the whole process
+METRICS = Metrics(enabled=os.environ.get('DIAGNOSIS_DEBUG', '') not in ('', '0'))
@@ -0,0 +1,190 @@
+"""Build, save and load the persisted diagnosis model artifact.
+
+The artifact bundles everything HealthcareChatbot used to recompute on every
+launch (fitted model, disease names, symptom columns, per-disease symptom
+profile and differential counts).  It is keyed by a content hash of the
+training CSV so it is rebuilt automatically whenever the data changes.
+Doctors are not part of the model; see doctor_directory.py.
+
+Everything is stored as plain NumPy arrays plus a JSON header in one ``.npz``
+file, so loading it imports neither scikit-learn nor pandas; those are only
+needed by build_artifact.
+
+The model backend used for diagnosis (see model_backends.py) comes from the
+MODEL_BACKEND environment variable, 'tree' by default; the Q&A question flow
+is always compiled from a decision tree.
+
+Run ``python model_artifact.py [--backend NAME]`` to (re)build the artifact
+ahead of time.
+"""
+import argparse
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+from question_flow import QuestionFlow
+
+# Bump whenever the layout of the artifact changes
+ARTIFACT_VERSION = 9
+ARTIFACT_PATH = 'model_artifact.npz'
+
+DEFAULT_BACKEND = os.environ.get('MODEL_BACKEND', 'tree')
+
+TRAINING_CSV = 'Training.csv'
+DATA_FILES = (TRAINING_CSV,)
+
+
+def data_hash(paths=DATA_FILES):
+    """Return a SHA-256 content hash over the given data files"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_artifact(backend=DEFAULT_BACKEND):
+    """Train the model from the CSV files and return the artifact dictionary"""
+    # Training dependencies are only needed when the artifact is rebuilt
+    from sklearn.model_selection import train_test_split
+    from differential import DifferentialScorer, partial_samples
+    from model_backends import TreeBackend, make_backend
+    from training_data import load_or_convert
+
+    # Load the memory-mapped training data (converted from the CSV if needed);
+    # the symptoms are a CSR matrix and stay sparse through training
+    training_data = load_or_convert(TRAINING_CSV)
+    X = training_data.symptoms
+    y = training_data.labels.astype(np.intp)
+
+    # Train the diagnosis backend, plus a decision tree for the question flow
+    # unless the backend already is one; labels are encoded in sorted order,
+    # as LabelEncoder would do
+    n_classes = len(training_data.label_names)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=0)
+    model = make_backend(backend, n_classes).fit(X_train, y_train)
+    tree = model if isinstance(model, TreeBackend) else TreeBackend(n_classes).fit(X_train, y_train)
+
+    # Bayesian differential scorer, calibrated on partial held-out symptom sets
+    counts, totals = training_data.symptom_counts()
+    differential = DifferentialScorer(counts, totals)
+    differential.calibrate(*partial_samples(X_test, y_test, np.random.default_rng(0)))
+
+    # Identifies this particular fit; the tree differs between retrains
+    model_id = uuid.uuid4().hex
+    current_hash = data_hash()
+    cols = list(training_data.columns)
+    classes = list(training_data.label_names)
+
+    return {
+        "version": ARTIFACT_VERSION,
+        "data_hash": current_hash,
+        "model_id": model_id,
+        "backend": model,
+        "classes": classes,
+        "cols": cols,
+        # Per-disease symptom profile (formerly the dimensionality_reduction table)
+        "profiles": training_data.profiles(),
+        "differential": differential,
+        "question_flow": QuestionFlow.compile(tree, cols, classes, current_hash, model_id),
+    }
+
+
+def save_artifact(artifact, path=ARTIFACT_PATH):
+    """Atomically write the artifact to disk"""
+    backend = artifact["backend"]
+    differential = artifact["differential"]
+    header = {
+        "version": artifact["version"],
+        "data_hash": artifact["data_hash"],
+        "model_id": artifact["model_id"],
+        "backend": backend.name,
+        "classes": artifact["classes"],
+        "cols": artifact["cols"],
+        "differential": {"alpha": differential.alpha, "temperature": differential.temperature},
+        "question_flow": artifact["question_flow"].to_dict(),
+    }
+    if "updates" in artifact:
+        # Stored cases folded into this model, see model_updates.py
+        header["updates"] = artifact["updates"]
+    arrays = {"backend." + name: values for name, values in backend.arrays().items()}
+    arrays["profiles"] = artifact["profiles"]
+    arrays["differential.counts"] = differential.counts
+    arrays["differential.totals"] = differential.totals
+    arrays["header"] = np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8)
+
+    # Per process, since every service worker may save its updated model
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path=ARTIFACT_PATH, backend=DEFAULT_BACKEND):
+    """Load the artifact from disk, or return None if it is missing, stale or
+    was built for another backend"""
+    from differential import DifferentialScorer
+    from model_backends import BACKENDS
+
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(data["header"].tobytes().decode('utf-8'))
+            if header.get("version") != ARTIFACT_VERSION:
+                return None
+            if header.get("data_hash") != data_hash():
+                return None
+            if header.get("backend") != backend:
+                return None
+            arrays = {name: data[name] for name in data.files}
+    except Exception:
+        return None
+
+    classes, cols = header["classes"], header["cols"]
+    backend_arrays = {name[len("backend."):]: values for name, values in arrays.items()
+                      if name.startswith("backend.")}
+    artifact = {
+        "version": header["version"],
+        "data_hash": header["data_hash"],
+        "model_id": header["model_id"],
+        "backend": BACKENDS[backend].from_arrays(len(classes), len(cols), backend_arrays),
+        "classes": classes,
+        "cols": cols,
+        "profiles": arrays["profiles"],
+        "differential": DifferentialScorer(arrays["differential.counts"], arrays["differential.totals"],
+                                           **header["differential"]),
+        "question_flow": QuestionFlow.from_dict(header["question_flow"]),
+    }
+    if "updates" in header:
+        artifact["updates"] = header["updates"]
+    return artifact
+
+
+def load_or_build(path=ARTIFACT_PATH, backend=DEFAULT_BACKEND):
+    """Return the current artifact, retraining and saving it only if needed"""
+    artifact = load_artifact(path, backend)
+    if artifact is None:
+        artifact = build_artifact(backend)
+        try:
+            save_artifact(artifact, path)
+        except OSError:
+            # A read-only install can still run from the in-memory model
+            pass
+    return artifact
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the diagnosis model artifact")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND,
+                        help="model backend: tree, forest, bernoulli_nb or boosting")
+    args = parser.parse_args()
+    artifact = build_artifact(args.backend)
+    save_artifact(artifact)
+    print(f"Saved {ARTIFACT_PATH} (version {artifact['version']}, backend {args.backend}, "
+          f"data {artifact['data_hash'][:12]})")
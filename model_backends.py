@@ -0,0 +1,532 @@
+"""Interchangeable classifier backends for the diagnosis model.
+
+Each backend is trained with scikit-learn, then keeps only plain NumPy arrays
+(tree nodes, leaf values, class counts) and predicts from those, so a saved
+model loads and runs without importing scikit-learn.  The interface used by
+DiagnosisEngine:
+
+    predict(X)         class ids (label-encoder order) for 0/1 symptom rows,
+                       dense or CSR
+    predict_indices(i) class id for one patient, from the sorted column
+                       indices of the reported symptoms
+    predict_proba(X)   (rows x classes) probabilities in the same class order
+    explain(i)         [(symptom index, weight)] of the reported symptoms that
+                       drove one patient's prediction, strongest first
+    updated(X, y)      a copy trained further on new labeled rows, for the
+                       backends marked ``incremental`` (ValueError otherwise)
+    arrays()           the fitted state, for the model artifact; from_arrays()
+                       restores a backend from it
+
+Training and batch prediction take CSR matrices (see sparse_symptoms.py).  The
+tree and naive Bayes backends predict single patients straight from the
+reported symptom indices, so a request costs the same whatever the vocabulary
+size; histogram boosting has no sparse support and densifies its training
+input.
+
+The backend is picked by name from BACKENDS when the artifact is built, e.g.
+``MODEL_BACKEND=forest`` or ``python model_artifact.py --backend forest``.
+Run ``python model_backends.py`` to report the accuracy and latency of every
+backend on Testing.csv.
+"""
+import abc
+import copy
+import time
+
+import numpy as np
+from scipy import sparse
+
+from sparse_symptoms import as_csr, csr_rows, label_sums, row_lengths, row_positives
+
+
+class ModelBackend(abc.ABC):
+    name = None
+    # Whether updated() can fold new rows in without a full refit
+    incremental = False
+    # Names of the arrays that make up the fitted state, see arrays()
+    state = ()
+
+    def __init__(self, n_classes):
+        self.n_classes = n_classes
+        self.n_features = None
+
+    @abc.abstractmethod
+    def make_classifier(self):
+        """Return a new, unfitted scikit-learn classifier"""
+
+    def fit(self, X, y):
+        classifier = self.make_classifier()
+        classifier.fit(X, y)
+        self.n_features = X.shape[1]
+        self._export(classifier)
+        self._prepare()
+        return self
+
+    @abc.abstractmethod
+    def _export(self, classifier):
+        """Copy the fitted classifier into the arrays named in ``state``"""
+
+    def _prepare(self):
+        """Build the prediction tables from the state arrays"""
+
+    def arrays(self):
+        """The fitted state as a {name: NumPy array} dictionary"""
+        return {name: getattr(self, '_' + name) for name in self.state}
+
+    @classmethod
+    def from_arrays(cls, n_classes, n_features, arrays):
+        """Restore a fitted backend from the output of arrays()"""
+        backend = cls(n_classes)
+        backend.n_features = n_features
+        for name in cls.state:
+            setattr(backend, '_' + name, np.asarray(arrays[name]))
+        backend._prepare()
+        return backend
+
+    def updated(self, X, y):
+        """Return a copy trained further on the labeled rows (X, y)"""
+        raise ValueError(f"the {self.name} backend cannot learn new cases incrementally; refit it")
+
+    @abc.abstractmethod
+    def predict(self, X):
+        """Class ids for the 0/1 rows of X"""
+
+    @abc.abstractmethod
+    def predict_proba(self, X):
+        """(rows x n_classes) probabilities for the 0/1 rows of X, in class id order"""
+
+    def predict_indices(self, symptom_indices):
+        return int(self.predict(csr_rows([symptom_indices], self.n_features))[0])
+
+    @abc.abstractmethod
+    def _weights(self, symptom_indices, label):
+        """Importance of each reported symptom for predicting label"""
+
+    def explain(self, symptom_indices):
+        symptom_indices = list(symptom_indices)
+        label = self.predict_indices(symptom_indices)
+        weights = np.asarray(self._weights(symptom_indices, label), dtype=np.float64)
+        order = np.argsort(-weights, kind='stable')
+        return [(symptom_indices[i], float(weights[i])) for i in order if weights[i] > 0]
+
+
+# Most symptom flags expanded to a dense block at a time by _walk, and the
+# number of steps between dropping the rows that reached their leaves
+WALK_BLOCK_CELLS = 1 << 22
+WALK_COMPACT_STEPS = 4
+
+
+def _csr(X):
+    return X.tocsr() if sparse.issparse(X) else as_csr(X)
+
+
+def _node_table(trees):
+    """One node table for many trees
+
+    ``trees`` yields (feature, threshold, left, right, is_leaf) arrays per
+    tree.  Child ids are offset into the shared table and leaves get -1
+    children, so every tree can be walked at once (see _walk).  Returns
+    (feature, threshold, left, right, roots).
+    """
+    features, thresholds, lefts, rights, roots = [], [], [], [], []
+    offset = 0
+    for feature, threshold, left, right, is_leaf in trees:
+        is_leaf = np.asarray(is_leaf, dtype=bool)
+        features.append(np.where(is_leaf, -1, feature).astype(np.int32))
+        thresholds.append(np.asarray(threshold, dtype=np.float64))
+        lefts.append(np.where(is_leaf, -1, np.asarray(left, dtype=np.int64) + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, np.asarray(right, dtype=np.int64) + offset).astype(np.int32))
+        roots.append(offset)
+        offset += len(is_leaf)
+    return (np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+            np.concatenate(rights), np.array(roots, dtype=np.int32))
+
+
+def _sklearn_tree(tree):
+    """(feature, threshold, left, right, is_leaf) of a fitted scikit-learn tree"""
+    return tree.feature, tree.threshold, tree.children_left, tree.children_right, tree.children_left == -1
+
+
+def _class_values(tree, classes, n_classes):
+    """Class probabilities at every node of a fitted tree, over all n_classes,
+    normalized as DecisionTreeClassifier.predict_proba does"""
+    values = tree.value[:, 0, :]
+    normalizer = values.sum(axis=1)[:, None]
+    normalizer[normalizer == 0.0] = 1.0
+    mapped = np.zeros((len(values), n_classes))
+    mapped[:, classes] = values / normalizer
+    return mapped
+
+
+def _walk_table(feature, threshold, left, right, roots):
+    """Node table for _walk: leaves loop back to themselves, so a row that has
+    reached its leaf can keep stepping until it is dropped"""
+    n_nodes = len(feature)
+    is_leaf = left == -1
+    nodes = np.arange(n_nodes)
+    children = np.concatenate([np.where(is_leaf, nodes, left), np.where(is_leaf, nodes, right)])
+    # Number of steps down to the deepest leaf
+    depth, level = 0, roots.astype(np.intp)
+    while len(level):
+        level = level[~is_leaf[level]]
+        level = np.concatenate([left[level], right[level]]).astype(np.intp)
+        depth += 1
+    return (np.where(is_leaf, 0, feature).astype(np.intp), np.where(is_leaf, np.inf, threshold),
+            children.astype(np.intp), is_leaf, roots.astype(np.intp), depth)
+
+
+def _walk(table, X):
+    """(rows x trees) leaf reached in every tree by every row of a 0/1 CSR matrix
+
+    All (row, tree) pairs descend one level per step, and the ones that
+    reached a leaf are dropped every WALK_COMPACT_STEPS steps.  Rows are
+    expanded to dense blocks of at most WALK_BLOCK_CELLS symptom flags, so a
+    test is one array lookup while memory stays bounded whatever the
+    vocabulary size.
+    """
+    feature, threshold, children, is_leaf, roots, depth = table
+    n_nodes, n_trees = len(feature), len(roots)
+    leaves = np.empty((X.shape[0], n_trees), dtype=np.int32)
+    block_rows = max(1, WALK_BLOCK_CELLS // max(X.shape[1], 1))
+    for start in range(0, X.shape[0], block_rows):
+        # Reported symptoms are 1 and every other symptom 0
+        block = X[start:start + block_rows].toarray()
+        flags = block.ravel()
+        out = leaves[start:start + block.shape[0]].reshape(-1)
+        position = np.arange(len(out))
+        offset = np.repeat(np.arange(block.shape[0]) * block.shape[1], n_trees)
+        node = np.tile(roots, block.shape[0])
+        step = 0
+        while len(node):
+            node = children[node + n_nodes * (flags[offset + feature[node]] > threshold[node])]
+            step += 1
+            if step % WALK_COMPACT_STEPS == 0 or step >= depth:
+                done = is_leaf[node]
+                out[position[done]] = node[done]
+                position, offset, node = position[~done], offset[~done], node[~done]
+    return leaves
+
+
+def _leaf(nodes, present, root=0):
+    """Leaf reached by a patient with the set of present symptom indices
+
+    Reported symptoms are 1 and every other symptom 0, so no feature vector
+    is needed; the cost is the depth of the path.
+    """
+    feature, threshold, left, right = nodes
+    node = root
+    while left[node] != -1:
+        value = 1.0 if feature[node] in present else 0.0
+        node = left[node] if value <= threshold[node] else right[node]
+    return node
+
+
+class TreeBackend(ModelBackend):
+    name = 'tree'
+    state = ('feature', 'threshold', 'left', 'right', 'values')
+
+    def make_classifier(self):
+        from sklearn.tree import DecisionTreeClassifier
+        return DecisionTreeClassifier()
+
+    def _export(self, classifier):
+        table = _node_table([_sklearn_tree(classifier.tree_)])
+        self._feature, self._threshold, self._left, self._right = table[:4]
+        self._values = _class_values(classifier.tree_, classifier.classes_, self.n_classes)
+
+    def _prepare(self):
+        self._nodes = (self._feature.tolist(), self._threshold.tolist(), self._left.tolist(),
+                       self._right.tolist())
+        self._table = _walk_table(self._feature, self._threshold, self._left, self._right,
+                                  np.zeros(1, dtype=np.int32))
+        self._node_classes = self._values.argmax(axis=1)
+        self._node_class_list = self._node_classes.tolist()
+
+    def predict(self, X):
+        return self._node_classes[_walk(self._table, _csr(X))[:, 0]]
+
+    def predict_proba(self, X):
+        return self._values[_walk(self._table, _csr(X))[:, 0]]
+
+    def predict_indices(self, symptom_indices):
+        return self._node_class_list[_leaf(self._nodes, set(symptom_indices))]
+
+    def _weights(self, symptom_indices, label):
+        # Symptoms tested on the decision path, weighted by how early they were asked
+        feature, threshold, left, right = self._nodes
+        present = set(symptom_indices)
+        asked = {}
+        node, depth = 0, 0
+        while left[node] != -1:
+            asked.setdefault(feature[node], 1.0 / (depth + 1))
+            value = 1.0 if feature[node] in present else 0.0
+            node = left[node] if value <= threshold[node] else right[node]
+            depth += 1
+        return [asked.get(idx, 0.0) for idx in symptom_indices]
+
+
+class ForestBackend(ModelBackend):
+    name = 'forest'
+    state = ('feature', 'threshold', 'left', 'right', 'roots', 'values', 'importances')
+
+    def make_classifier(self):
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_estimators=100, n_jobs=-1, random_state=0)
+
+    def _export(self, classifier):
+        # Every tree in one node table, with the class probabilities at each node
+        table = _node_table(_sklearn_tree(estimator.tree_) for estimator in classifier.estimators_)
+        self._feature, self._threshold, self._left, self._right, self._roots = table
+        self._values = np.concatenate([_class_values(estimator.tree_, classifier.classes_, self.n_classes)
+                                       for estimator in classifier.estimators_])
+        self._importances = classifier.feature_importances_
+
+    def _prepare(self):
+        self._nodes = (self._feature.tolist(), self._threshold.tolist(), self._left.tolist(),
+                       self._right.tolist())
+        self._root_list = self._roots.tolist()
+        self._table = _walk_table(self._feature, self._threshold, self._left, self._right, self._roots)
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def predict_proba(self, X):
+        # Average of the trees' leaf probabilities, summed tree by tree as
+        # RandomForestClassifier.predict_proba does
+        leaves = _walk(self._table, _csr(X))
+        proba = np.zeros((leaves.shape[0], self.n_classes))
+        for tree in range(leaves.shape[1]):
+            proba += self._values[leaves[:, tree]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict_indices(self, symptom_indices):
+        present = set(symptom_indices)
+        proba = np.zeros(self.n_classes)
+        for root in self._root_list:
+            proba += self._values[_leaf(self._nodes, present, root)]
+        proba /= len(self._root_list)
+        return int(np.argmax(proba))
+
+    def _weights(self, symptom_indices, label):
+        # Impurity importances of the forest, whatever the prediction
+        return self._importances[symptom_indices]
+
+
+class NaiveBayesBackend(ModelBackend):
+    name = 'bernoulli_nb'
+    incremental = True
+    state = ('classes', 'class_count', 'feature_count', 'alpha')
+
+    def make_classifier(self):
+        from sklearn.naive_bayes import BernoulliNB
+        return BernoulliNB()
+
+    def _export(self, classifier):
+        self._classes = classifier.classes_.astype(np.intp)
+        self._class_count = classifier.class_count_.copy()
+        self._feature_count = classifier.feature_count_.copy()
+        self._alpha = np.array(float(classifier.alpha))
+
+    def _prepare(self):
+        # Joint log-likelihood = base + the sum of the per-symptom log-odds of
+        # the reported symptoms, the same terms BernoulliNB computes from its
+        # counts (written exactly as BernoulliNB does, so that tied diseases
+        # resolve alike)
+        alpha = float(self._alpha)
+        log_p = np.log(self._feature_count + alpha) - np.log((self._class_count + alpha * 2).reshape(-1, 1))
+        log_not_p = np.log(1 - np.exp(log_p))
+        class_log_prior = np.log(self._class_count) - np.log(self._class_count.sum())
+        self._log_odds = np.ascontiguousarray((log_p - log_not_p).T)
+        self._base = class_log_prior + log_not_p.sum(axis=1)
+
+    def _scores(self, X):
+        return np.asarray(_csr(X) @ self._log_odds) + self._base
+
+    def predict(self, X):
+        return self._classes[np.argmax(self._scores(X), axis=1)]
+
+    def predict_proba(self, X):
+        return _class_proba(_softmax(self._scores(X)), self._classes, self.n_classes)
+
+    def predict_indices(self, symptom_indices):
+        scores = self._base + self._log_odds[list(symptom_indices)].sum(axis=0)
+        return int(self._classes[np.argmax(scores)])
+
+    def updated(self, X, y):
+        # Like partial_fit, only the classes seen by the first fit are accepted
+        if not np.isin(y, self._classes).all():
+            raise ValueError("new cases include a disease the model was not trained on")
+        rows = np.searchsorted(self._classes, y)
+        backend = copy.copy(self)
+        backend._class_count = self._class_count + np.bincount(rows, minlength=len(self._classes))
+        backend._feature_count = self._feature_count + label_sums(X, rows, len(self._classes))
+        backend._prepare()
+        return backend
+
+    def _weights(self, symptom_indices, label):
+        # Log-likelihood ratio of each reported symptom for the predicted class
+        return self._log_odds[symptom_indices, np.searchsorted(self._classes, label)]
+
+
+class BoostingBackend(ModelBackend):
+    name = 'boosting'
+    state = ('feature', 'threshold', 'left', 'right', 'roots', 'values', 'tree_class', 'baseline', 'classes',
+             'class_frequencies')
+
+    def make_classifier(self):
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        return HistGradientBoostingClassifier(max_iter=50, random_state=0)
+
+    def fit(self, X, y):
+        super().fit(_dense(X), y)
+        # Histogram boosting has no impurity importances; explain() uses the
+        # symptom frequencies of the predicted class in the training data
+        counts = label_sums(X, y, self.n_classes)
+        self._class_frequencies = counts / np.maximum(np.bincount(y, minlength=self.n_classes), 1)[:, None]
+        return self
+
+    def _export(self, classifier):
+        # One tree per class and iteration (private scikit-learn attributes:
+        # there is no public access to the fitted predictors)
+        predictors = [predictor for iteration in classifier._predictors for predictor in iteration]
+        table = _node_table((p.nodes['feature_idx'], p.nodes['num_threshold'], p.nodes['left'],
+                             p.nodes['right'], p.nodes['is_leaf']) for p in predictors)
+        self._feature, self._threshold, self._left, self._right, self._roots = table
+        self._values = np.concatenate([p.nodes['value'] for p in predictors]).astype(np.float64)
+        per_iteration = classifier.n_trees_per_iteration_
+        self._tree_class = np.tile(np.arange(per_iteration, dtype=np.int32), len(classifier._predictors))
+        self._baseline = np.asarray(classifier._baseline_prediction, dtype=np.float64).reshape(per_iteration)
+        self._classes = classifier.classes_.astype(np.intp)
+
+    def _prepare(self):
+        self._table = _walk_table(self._feature, self._threshold, self._left, self._right, self._roots)
+
+    def _raw(self, X):
+        """Summed leaf values per row and class column, added iteration by
+        iteration from the baseline as HistGradientBoostingClassifier does"""
+        leaves = _walk(self._table, _csr(X))
+        per_iteration = len(self._baseline)
+        values = self._values[leaves].reshape(leaves.shape[0], -1, per_iteration)
+        raw = np.tile(self._baseline, (leaves.shape[0], 1))
+        for iteration in range(values.shape[1]):
+            raw += values[:, iteration]
+        return raw
+
+    def predict(self, X):
+        raw = self._raw(X)
+        if raw.shape[1] == 1:
+            # Binary: one tree per iteration, positive raw score for classes[1]
+            return self._classes[(raw[:, 0] > 0).astype(np.intp)]
+        return self._classes[np.argmax(raw, axis=1)]
+
+    def predict_proba(self, X):
+        raw = self._raw(X)
+        if raw.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            proba = np.column_stack([1.0 - positive, positive])
+        else:
+            proba = _softmax(raw)
+        return _class_proba(proba, self._classes, self.n_classes)
+
+    def _weights(self, symptom_indices, label):
+        return self._class_frequencies[label, symptom_indices]
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    weights = np.exp(scores)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def _class_proba(proba, classes, n_classes):
+    """Spread probabilities over the trained classes onto every class id, in
+    case the training split missed one"""
+    spread = np.zeros((proba.shape[0], n_classes))
+    spread[:, classes] = proba
+    return spread
+
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else X
+
+
+BACKENDS = {backend.name: backend for backend in
+            (TreeBackend, ForestBackend, NaiveBayesBackend, BoostingBackend)}
+
+
+def make_backend(name, n_classes):
+    """Create an unfitted backend by name"""
+    try:
+        return BACKENDS[name](n_classes)
+    except KeyError:
+        raise ValueError(f"Unknown model backend {name!r}, expected one of {sorted(BACKENDS)}")
+
+
+def evaluate(backend, X, y, repeats=200):
+    """Accuracy on (X, y) and single-row / batch prediction latency in seconds"""
+    accuracy = float((backend.predict(X) == y).mean())
+
+    # Single patients go through predict_indices, as in DiagnosisEngine.analyze
+    timings = []
+    for i in range(repeats):
+        symptom_indices = tuple(row_positives(X, i % X.shape[0]).tolist())
+        start = time.perf_counter()
+        backend.predict_indices(symptom_indices)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    backend.predict(X)
+    batch = time.perf_counter() - start
+    return {
+        "accuracy": accuracy,
+        "p50_latency": float(np.percentile(timings, 50)),
+        "p99_latency": float(np.percentile(timings, 99)),
+        "batch_rows_per_second": X.shape[0] / batch,
+    }
+
+
+def compare(names=None, test_csv='Testing.csv'):
+    """Train every backend on Training.csv and evaluate it on test_csv
+
+    Besides the full Testing.csv rows, accuracy is also measured on partial
+    copies that keep 1-5 random symptoms per row, as typed by patients.
+    """
+    import pandas as pd
+    from differential import partial_samples
+    from model_artifact import TRAINING_CSV
+    from sparse_symptoms import as_csr
+    from training_data import load_or_convert
+
+    training_data = load_or_convert(TRAINING_CSV)
+    X_train = training_data.symptoms
+    y_train = training_data.labels.astype(np.intp)
+    code_of = {name: code for code, name in enumerate(training_data.label_names)}
+
+    test = pd.read_csv(test_csv)
+    X_test = as_csr(test[training_data.columns].values)
+    y_test = test['prognosis'].map(code_of).values
+    rng = np.random.default_rng(0)
+    X_partial, y_partial = partial_samples(X_test[np.repeat(np.arange(X_test.shape[0]), 20)],
+                                           np.repeat(y_test, 20), rng)
+
+    report = {}
+    for name in names or BACKENDS:
+        backend = make_backend(name, len(training_data.label_names))
+        start = time.perf_counter()
+        backend.fit(X_train, y_train)
+        train_seconds = time.perf_counter() - start
+        stats = evaluate(backend, X_test, y_test)
+        stats["train_seconds"] = train_seconds
+        stats["partial_accuracy"] = float((backend.predict(X_partial) == y_partial).mean())
+        report[name] = stats
+    return report
+
+
+if __name__ == "__main__":
+    report = compare()
+    print(f"{'backend':<14}{'accuracy':>10}{'partial':>10}{'p50 us':>10}{'p99 us':>10}"
+          f"{'batch rows/s':>14}{'train s':>10}")
+    for name, stats in report.items():
+        print(f"{name:<14}{stats['accuracy']:>10.1%}{stats['partial_accuracy']:>10.1%}"
+              f"{stats['p50_latency'] * 1e6:>10.0f}{stats['p99_latency'] * 1e6:>10.0f}"
+              f"{stats['batch_rows_per_second']:>14.0f}{stats['train_seconds']:>10.2f}")
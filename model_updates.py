@@ -0,0 +1,278 @@
+"""Fold newly confirmed cases into the running diagnosis model.
+
+ModelUpdater wraps the active DiagnosisEngine.  add() validates labeled cases
+and appends them to the delta store (case_store.py); refresh() reads the cases
+stored since the last refresh, by any process, and installs a new engine in
+which:
+
+  - the per-disease symptom profiles include the
+    new cases' symptoms and the differential scorer includes their counts;
+  - an incremental backend (bernoulli_nb) has been trained further on them;
+    other backends keep their fit until ``rebuild_after`` cases have piled up,
+    and are then refit on Training.csv plus every stored case.
+
+The question flow is kept, so Q&A sessions and tokens carry on across updates.
+refresh() is meant to run on a background thread: diagnoses take no lock and
+keep using the engine they started with, and the new engine replaces it with a
+single attribute assignment.
+
+Every new model is also saved to model_updated.npz together with the store
+offset it covers, and load_updater() starts from it, so a restart only reads
+the cases stored since instead of folding in (and refitting on) every case.
+
+Run ``python model_updates.py add "Fungal infection" itching skin_rash`` to
+store a case, ``python model_updates.py import cases.jsonl`` to store a file
+of them, and ``python model_updates.py status`` to see how long folding in the
+stored cases takes.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from case_store import CaseStore
+from metrics import METRICS
+from model_artifact import load_artifact, save_artifact
+from sparse_symptoms import csr_rows, row_lengths
+
+# Stored cases a non-incremental backend may lag behind before it is refit
+DEFAULT_REBUILD_AFTER = 200
+
+# The latest model with the stored cases folded in
+UPDATED_PATH = 'model_updated.npz'
+
+
+def updated_artifact(artifact, X, y, backend=None):
+    """Copy of an artifact with labeled CSR rows (X, y) folded into its disease
+    profiles and differential counts, and optionally a new backend"""
+    profiles = artifact["profiles"].copy()
+    profiles[np.repeat(y, row_lengths(X)), X.indices] = 1
+
+    updated = dict(artifact)
+    updated["profiles"] = profiles
+    updated["differential"] = artifact["differential"].updated(X, y)
+    if backend is not None:
+        updated["backend"] = backend
+    updated["model_id"] = uuid.uuid4().hex
+    return updated
+
+
+def saved_artifact(base_artifact, store, path=UPDATED_PATH):
+    """The model saved by an earlier update, or None if it is missing or does
+    not extend base_artifact with the cases at the start of the store"""
+    artifact = load_artifact(path, base_artifact["backend"].name)
+    if artifact is None:
+        return None
+    updates = artifact.get("updates")
+    if not updates or updates["base_model_id"] != base_artifact["model_id"]:
+        return None
+    if store.size() < updates["offset"] or store.digest(updates["offset"]) != updates["digest"]:
+        return None
+    return artifact
+
+
+class ModelUpdater:
+    def __init__(self, engine, store=None, rebuild_after=DEFAULT_REBUILD_AFTER, path=UPDATED_PATH,
+                 base_artifact=None):
+        """Wrap an engine loaded from the base artifact, before any stored case
+
+        With ``base_artifact``, the engine was loaded from a model saved by an
+        earlier update (see saved_artifact) and carries on from its offset.
+        Every new model is saved to ``path`` (None to keep them in memory).
+        """
+        self.engine = engine
+        self.store = store if store is not None else CaseStore()
+        self.rebuild_after = rebuild_after
+        self.path = path
+        self.base_artifact = base_artifact if base_artifact is not None else engine.artifact
+        # Store offset and number of cases in the current engine, and how many
+        # of those its backend has not been trained on
+        updates = engine.artifact.get("updates", {}) if base_artifact is not None else {}
+        self.offset = updates.get("offset", 0)
+        self.cases = updates.get("cases", 0)
+        self.untrained = updates.get("untrained", 0)
+        # Serializes updates only; diagnoses never take it
+        self._lock = threading.Lock()
+
+    def encode_cases(self, cases):
+        """CSR rows and class ids of (symptoms, disease) cases, skipping unusable ones"""
+        vocabulary = self.engine.vocabulary
+        index_lists, labels = [], []
+        for symptoms, disease in cases:
+            label = vocabulary.disease_id(disease)
+            symptom_indices = vocabulary.encode(symptoms)
+            if label is None or not symptom_indices:
+                continue
+            index_lists.append(symptom_indices)
+            labels.append(label)
+        return csr_rows(index_lists, len(vocabulary)), np.array(labels, dtype=np.intp)
+
+    def add(self, cases):
+        """Validate and store (symptoms, disease) cases; return the number stored
+
+        Raises ValueError for an unknown disease (a new disease needs a row in
+        Training.csv and a full rebuild) or a case without a known symptom.
+        The cases reach the model on the next refresh().
+        """
+        vocabulary = self.engine.vocabulary
+        cases = [(list(symptoms), str(disease)) for symptoms, disease in cases]
+        for symptoms, disease in cases:
+            if vocabulary.disease_id(disease) is None:
+                raise ValueError(f"Unknown disease {disease!r}; new diseases need Training.csv "
+                                 "and a full rebuild")
+            if not vocabulary.encode(symptoms):
+                raise ValueError(f"A case of {disease!r} has no known symptoms")
+        return self.store.append(cases)
+
+    def pending(self):
+        """True if the store changed since the last refresh"""
+        return self.store.size() != self.offset
+
+    def refresh(self):
+        """Fold the newly stored cases into a new engine and swap it in
+
+        Returns True if a new engine was installed, and False straight away
+        when there is nothing new or another update is running.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            artifact = self.engine.artifact
+            if self.store.size() < self.offset:
+                # The store was truncated or replaced: replay it onto the base model
+                artifact = self.base_artifact
+                self.offset = self.cases = self.untrained = 0
+            cases, offset = self.store.read(self.offset)
+            if not cases and artifact is self.engine.artifact:
+                self.offset = offset
+                return False
+
+            with METRICS.time('model_update'):
+                X, y = self.encode_cases(cases)
+                backend = None
+                if len(y) and artifact["backend"].incremental:
+                    try:
+                        backend = artifact["backend"].updated(X, y)
+                    except ValueError:
+                        pass
+                if backend is None:
+                    self.untrained += len(y)
+                artifact = updated_artifact(artifact, X, y, backend)
+                self.offset = offset
+                self.cases += len(y)
+                if self.untrained >= self.rebuild_after:
+                    artifact = self._refit(artifact)
+            self._install(artifact)
+            self._save(artifact)
+            return True
+        finally:
+            self._lock.release()
+
+    def rebuild(self):
+        """Refit the backend on Training.csv plus the stored cases, and swap it in"""
+        with self._lock:
+            artifact = self._refit(self.engine.artifact)
+            self._install(artifact)
+            self._save(artifact)
+
+    def _refit(self, artifact):
+        """Artifact with its backend refit on Training.csv plus every folded-in case"""
+        from scipy import sparse
+        from model_artifact import TRAINING_CSV
+        from model_backends import make_backend
+        from training_data import load_or_convert
+
+        with METRICS.time('model_refit'):
+            training_data = load_or_convert(TRAINING_CSV)
+            X, y = self.encode_cases(self.store.read(0, self.offset)[0])
+            X = sparse.vstack([training_data.symptoms, X], format='csr')
+            y = np.concatenate([training_data.labels.astype(np.intp), y])
+            backend = make_backend(artifact["backend"].name, len(self.engine.vocabulary.diseases)).fit(X, y)
+        refit = dict(artifact)
+        refit["backend"] = backend
+        refit["model_id"] = uuid.uuid4().hex
+        self.untrained = 0
+        return refit
+
+    def _install(self, artifact):
+        engine = self.engine
+        # A fresh cache, so late results of the old engine cannot leak into it
+        self.engine = type(engine)(artifact, cache_size=engine.cache.maxsize, method=engine.method)
+        METRICS.inc('model_swaps')
+
+    def _save(self, artifact):
+        """Save a new model with the store offset it covers, for the next start"""
+        if self.path is None:
+            return
+        saved = dict(artifact)
+        saved["updates"] = {
+            "base_model_id": self.base_artifact["model_id"],
+            "offset": self.offset,
+            "digest": self.store.digest(self.offset),
+            "cases": self.cases,
+            "untrained": self.untrained,
+        }
+        try:
+            save_artifact(saved, self.path)
+        except OSError:
+            # A read-only install folds the cases in again at the next start
+            pass
+
+
+def load_updater(path=UPDATED_PATH, **kwargs):
+    """Load the engine and fold in every stored case
+
+    Starts from the model saved by the last update when it is still valid,
+    so only the cases stored since then are read.
+    """
+    from diagnosis_engine import DiagnosisEngine
+    from model_artifact import load_or_build
+
+    base_artifact = load_or_build()
+    store = CaseStore()
+    artifact = saved_artifact(base_artifact, store, path)
+    if artifact is None:
+        updater = ModelUpdater(DiagnosisEngine(base_artifact, **kwargs), store, path=path)
+    else:
+        updater = ModelUpdater(DiagnosisEngine(artifact, **kwargs), store, path=path,
+                               base_artifact=base_artifact)
+    updater.refresh()
+    return updater
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store confirmed cases for the diagnosis model")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="store one case")
+    add.add_argument('disease')
+    add.add_argument('symptoms', nargs='+')
+    add_file = commands.add_parser('import', help="store every case of a JSONL file")
+    add_file.add_argument('path', help='{"symptoms": [...], "disease": "..."} per line')
+    commands.add_parser('status', help="fold in the stored cases and report how long it takes")
+    args = parser.parse_args()
+
+    from diagnosis_engine import DiagnosisEngine
+    updater = ModelUpdater(DiagnosisEngine.load())
+    if args.command == 'add':
+        try:
+            updater.add([(args.symptoms, args.disease)])
+        except ValueError as e:
+            sys.exit(f"Nothing stored: {e}")
+        print(f"Stored 1 case of {args.disease} in {updater.store.path}")
+    elif args.command == 'import':
+        with open(args.path, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file if line.strip()]
+        try:
+            count = updater.add([(record["symptoms"], record["disease"]) for record in records])
+        except (KeyError, ValueError) as e:
+            sys.exit(f"Nothing stored: {e}")
+        print(f"Stored {count} cases in {updater.store.path}")
+    else:
+        start = time.perf_counter()
+        updater.refresh()
+        print(f"{updater.cases} stored cases folded in {time.perf_counter() - start:.3f} s "
+              f"({updater.untrained} not yet trained into the {updater.engine.backend.name} backend)")
@@ -0,0 +1,145 @@
+"""Disease ranking by overlap between packed symptom bitsets.
+
+Each disease profile (one row of the profile table) is packed into 64-bit
+words, and so is each patient's set of reported symptoms.  The intersection
+with every profile is the popcount of an AND over the words the patient
+actually touches, so a query costs a few vectorized operations per disease no
+matter how many symptoms the vocabulary has.  Diseases are ranked by Jaccard
+similarity; the same intersections give the profile coverage used as the
+result confidence.
+
+Batches may also be given as sparse (CSR) rows, in which case the
+intersections come from a sparse product with the profile table and cost
+O(reported symptoms x diseases) whatever the vocabulary size.
+"""
+import numpy as np
+from scipy import sparse
+
+from sparse_symptoms import row_lengths
+
+# np.bitwise_count needs NumPy 2.0; fall back to a byte lookup table
+if hasattr(np, 'bitwise_count'):
+    def popcount(words):
+        return np.bitwise_count(words)
+else:
+    _BYTE_COUNTS = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        words = np.ascontiguousarray(words)
+        counts = _BYTE_COUNTS[words.view(np.uint8)]
+        return counts.reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+# int.bit_count needs Python 3.10; the app still supports 3.8
+try:
+    popcount_int = int.bit_count
+except AttributeError:
+    def popcount_int(value):
+        return bin(value).count('1')
+
+
+def pack_rows(X):
+    """Pack 0/1 rows into uint64 words, symptom i at bit i % 64 of word i // 64"""
+    X = np.atleast_2d(np.asarray(X, dtype=np.uint8))
+    n_words = (X.shape[1] + 63) // 64
+    packed = np.packbits(X, axis=1, bitorder='little')
+    padded = np.zeros((X.shape[0], n_words * 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded.view('<u8').astype(np.uint64)
+
+
+class ProfileScorer:
+    def __init__(self, profiles):
+        """Pack a (diseases x symptoms) 0/1 profile matrix"""
+        profiles = np.asarray(profiles, dtype=np.uint8)
+        self.profiles = profiles
+        self.n_symptoms = profiles.shape[1]
+        self.masks = pack_rows(profiles)
+        self.sizes = popcount(self.masks).sum(axis=1, dtype=np.int64)
+        # Word-major copy so one query word ANDs against a contiguous row
+        self._word_masks = np.ascontiguousarray(self.masks.T)
+        # Symptom-major copy for sparse products with CSR query rows
+        self._columns = np.ascontiguousarray(profiles.T, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def pack(self, symptom_indices):
+        """Return {word id: word} for the non-empty words of a symptom index set"""
+        words = {}
+        for idx in symptom_indices:
+            words[idx >> 6] = words.get(idx >> 6, 0) | (1 << (idx & 63))
+        return words
+
+    def overlap(self, symptom_indices):
+        """Number of reported symptoms in each disease profile"""
+        overlap = np.zeros(len(self.masks), dtype=np.int64)
+        for word_id, word in self.pack(symptom_indices).items():
+            overlap += popcount(self._word_masks[word_id] & np.uint64(word))
+        return overlap
+
+    def scores(self, symptom_indices):
+        """Jaccard similarity between the reported symptoms and every profile"""
+        overlap = self.overlap(symptom_indices)
+        union = self.sizes + len(set(symptom_indices)) - overlap
+        if not symptom_indices:
+            return np.divide(overlap, union, out=np.zeros(len(overlap)), where=union > 0)
+        return overlap / union
+
+    def rank(self, symptom_indices, k=None):
+        """Disease ids ordered by similarity, best first (ties keep class order)"""
+        order = np.argsort(-self.scores(symptom_indices), kind='stable')
+        return order if k is None else order[:k]
+
+    def best(self, symptom_indices):
+        """Id of the most similar disease"""
+        return int(np.argmax(self.scores(symptom_indices)))
+
+    def coverage(self, label, symptom_indices):
+        """Share of a disease's profile symptoms that were reported"""
+        if not self.sizes[label]:
+            return 0.0
+        masks = self.masks[label].tolist()
+        overlap = sum(popcount_int(masks[word_id] & word)
+                      for word_id, word in self.pack(symptom_indices).items())
+        return overlap / int(self.sizes[label])
+
+    # Batches of 0/1 rows, dense or CSR
+
+    def overlap_many(self, Q):
+        """(rows x diseases) overlap counts for packed query rows Q"""
+        overlap = np.zeros((len(Q), len(self.masks)), dtype=np.int64)
+        for word in range(Q.shape[1]):
+            active = Q[:, word] != 0
+            if active.any():
+                overlap[active] += popcount(Q[active, word, None] & self._word_masks[word])
+        return overlap
+
+    def best_many(self, X):
+        """Most similar disease id for each 0/1 row of X"""
+        if sparse.issparse(X):
+            X = sparse.csr_matrix(X)
+            overlap = np.asarray(X @ self._columns, dtype=np.int64)
+            query_sizes = row_lengths(X)
+        else:
+            Q = pack_rows(X)
+            overlap = self.overlap_many(Q)
+            query_sizes = popcount(Q).sum(axis=1, dtype=np.int64)
+        union = self.sizes[None, :] + query_sizes[:, None] - overlap
+        scores = np.divide(overlap, union, out=np.zeros(overlap.shape), where=union > 0)
+        return scores.argmax(axis=1)
+
+    def coverage_many(self, labels, X):
+        """Profile coverage of each row of X for its predicted disease"""
+        labels = np.asarray(labels, dtype=np.intp)
+        if sparse.issparse(X):
+            X = sparse.csr_matrix(X)
+            lengths = row_lengths(X)
+            hits = self.profiles[np.repeat(labels, lengths), X.indices]
+            overlap = np.bincount(np.repeat(np.arange(X.shape[0]), lengths), weights=hits,
+                                  minlength=X.shape[0])
+        else:
+            Q = pack_rows(X)
+            overlap = popcount(Q & self.masks[labels]).sum(axis=1, dtype=np.int64)
+        sizes = self.sizes[labels]
+        return np.divide(overlap, sizes, out=np.zeros(len(labels)), where=sizes > 0)
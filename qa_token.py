@@ -0,0 +1,168 @@
+"""Stateless, resumable Q&A sessions encoded as compact opaque tokens.
+
+A token carries everything needed to continue a guided diagnosis: the model it
+was issued for, the current node of the question flow and the symptoms
+answered "yes" so far as a bitset.  Any worker that has loaded the same model
+can resume a session from its token, so no per-user state is kept server side.
+
+Layout before base64url encoding (big-endian):
+
+    1 byte   format version
+    8 bytes  model tag (first 8 bytes of the artifact's model_id)
+    4 bytes  node id
+    n bytes  bitset of present symptoms, ceil(symptoms / 8) bytes
+    4 bytes  keyed BLAKE2b checksum
+
+The checksum key is QA_TOKEN_SECRET, or else a random key generated on first
+use and kept in qa_token.key, so every worker started from the same directory
+accepts the others' tokens.  Workers on several hosts need QA_TOKEN_SECRET.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import struct
+
+TOKEN_VERSION = 1
+
+# Where the generated key is kept when QA_TOKEN_SECRET is not set
+SECRET_PATH = 'qa_token.key'
+SECRET_BYTES = 32
+
+_HEADER = struct.Struct('>B8sI')
+_CHECKSUM_BYTES = 4
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+_secret = None
+
+
+def token_secret(path=SECRET_PATH):
+    """The checksum key: QA_TOKEN_SECRET, or the key stored at path, which is
+    generated the first time"""
+    global _secret
+    if _secret is None:
+        _secret = os.environ.get('QA_TOKEN_SECRET', '').encode() or _stored_secret(path)
+    return _secret
+
+
+def _stored_secret(path):
+    try:
+        with open(path, 'rb') as file:
+            secret = file.read()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    # Write a private temporary file and link it into place, which fails if
+    # another worker got there first; then everyone reads the same key
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, os.urandom(SECRET_BYTES))
+    finally:
+        os.close(fd)
+    try:
+        os.link(tmp, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp)
+    with open(path, 'rb') as file:
+        secret = file.read()
+    if not secret:
+        raise ValueError(f"{path} is empty; delete it or set QA_TOKEN_SECRET")
+    return secret
+
+
+class QATokenCodec:
+    def __init__(self, flow, vocabulary, secret=None):
+        """Issue and resume tokens for one compiled question flow
+
+        ``secret`` keys the checksum, so tokens cannot be forged without it;
+        it defaults to token_secret(), read when the first token is made.
+        """
+        if secret is not None and not secret:
+            raise ValueError("the token secret must not be empty")
+        self.flow = flow
+        self.vocabulary = vocabulary
+        self._secret = secret
+        self.model_tag = bytes.fromhex(flow.model_id or '')[:8].ljust(8, b'\0')
+        self._bitset_bytes = (len(vocabulary) + 7) // 8
+
+    @property
+    def secret(self):
+        if self._secret is None:
+            self._secret = token_secret()
+        return self._secret
+
+    def _checksum(self, payload):
+        return hashlib.blake2b(payload, digest_size=_CHECKSUM_BYTES, key=self.secret).digest()
+
+    def encode(self, node, present):
+        """Encode a node id and a bitset (int) of present symptom indices"""
+        payload = (_HEADER.pack(TOKEN_VERSION, self.model_tag, node) +
+                   present.to_bytes(self._bitset_bytes, 'big'))
+        raw = payload + self._checksum(payload)
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+    def decode(self, token):
+        """Return (node, present bitset) from a token, or raise InvalidToken"""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (ValueError, TypeError):
+            raise InvalidToken("token is not valid base64")
+        if len(raw) != _HEADER.size + self._bitset_bytes + _CHECKSUM_BYTES:
+            raise InvalidToken("token has the wrong length")
+
+        payload, checksum = raw[:-_CHECKSUM_BYTES], raw[-_CHECKSUM_BYTES:]
+        if not hmac.compare_digest(checksum, self._checksum(payload)):
+            raise InvalidToken("token checksum mismatch")
+        version, model_tag, node = _HEADER.unpack_from(payload)
+        if version != TOKEN_VERSION:
+            raise InvalidToken("unsupported token version")
+        if model_tag != self.model_tag:
+            raise InvalidToken("token was issued for a different model")
+        if node >= len(self.flow):
+            raise InvalidToken("token refers to an unknown node")
+        present = int.from_bytes(payload[_HEADER.size:], 'big')
+        if present >> len(self.vocabulary):
+            raise InvalidToken("token refers to an unknown symptom")
+        return node, present
+
+    def start(self):
+        """Token for a new session at the root of the question flow"""
+        return self.encode(0, 0)
+
+    def step(self, token, answer):
+        """Apply a yes (True) / no (False) answer and return the next token"""
+        node, present = self.decode(token)
+        symptom = self.flow.question(node)
+        if symptom is None:
+            return token
+        if answer:
+            present |= 1 << self.vocabulary.index_of(symptom)
+        return self.encode(self.flow.next_node(node, answer), present)
+
+    def symptoms_present(self, present):
+        """Symptom names set in a bitset, in column order"""
+        names = []
+        while present:
+            lowest = present & -present
+            names.append(self.vocabulary.name_of(lowest.bit_length() - 1))
+            present ^= lowest
+        return names
+
+    def view(self, token):
+        """Describe the session state: question, answered symptoms and leaf disease"""
+        node, present = self.decode(token)
+        return {
+            "token": token,
+            "node": node,
+            "question": self.flow.question(node),
+            "symptoms_present": self.symptoms_present(present),
+            "disease": self.flow.leaf_disease(node),
+        }
@@ -0,0 +1,70 @@
+"""Flat question-flow table compiled from the fitted decision tree.
+
+Each node stores the symptom asked, the yes/no child indices and, at leaves,
+the resolved disease name, so Q&A sessions step through plain list lookups.
+The table is stored in the header of the model artifact (see
+model_artifact.py) together with the model it was compiled from, so Q&A
+sessions and tokens always follow the loaded model and need no scikit-learn.
+"""
+
+
+class QuestionFlow:
+    __slots__ = ('questions', 'yes', 'no', 'diseases', 'data_hash', 'model_id')
+
+    def __init__(self, questions, yes, no, diseases, data_hash=None, model_id=None):
+        self.questions = questions
+        self.yes = yes
+        self.no = no
+        self.diseases = diseases
+        self.data_hash = data_hash
+        self.model_id = model_id
+
+    @classmethod
+    def compile(cls, tree, symptoms, classes, data_hash=None, model_id=None):
+        """Compile a fitted tree backend (model_backends.TreeBackend) into a flow table"""
+        arrays = tree.arrays()
+        questions, yes, no, diseases = [], [], [], []
+        for node in range(len(arrays["feature"])):
+            left = int(arrays["left"][node])
+            right = int(arrays["right"][node])
+            if left == right:
+                # Leaf: first class present at the node, as the tree walk decoded it
+                present = arrays["values"][node].nonzero()[0]
+                questions.append(None)
+                diseases.append(str(classes[present[0]]))
+            else:
+                questions.append(str(symptoms[arrays["feature"][node]]))
+                diseases.append(None)
+            yes.append(right)
+            no.append(left)
+        return cls(questions, yes, no, diseases, data_hash, model_id)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def question(self, node):
+        """Return the symptom asked at a node, or None at a leaf"""
+        return self.questions[node]
+
+    def next_node(self, node, answer):
+        """Follow the yes (True) or no (False) branch from a node"""
+        return self.yes[node] if answer else self.no[node]
+
+    def leaf_disease(self, node):
+        """Return the disease resolved at a leaf node"""
+        return self.diseases[node]
+
+    def to_dict(self):
+        return {
+            "data_hash": self.data_hash,
+            "model_id": self.model_id,
+            "questions": self.questions,
+            "yes": self.yes,
+            "no": self.no,
+            "diseases": self.diseases,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["questions"], data["yes"], data["no"], data["diseases"],
+                   data.get("data_hash"), data.get("model_id"))
@@ -0,0 +1,218 @@
+"""Many independent patient sessions sharing one read-only DiagnosisEngine.
+
+The manager looks the engine up on every call, through a function such as
+``lambda: updater.engine``, so sessions are diagnosed by the current model
+after a ModelUpdater swap.  A Q&A walk keeps the question flow it started
+with until it is restarted, so a swap never moves it onto another tree.
+
+Each session is a small ``__slots__`` object whose reported symptoms and Q&A
+answers are integer bitsets over the symptom vocabulary, so a process can keep
+a very large number of idle sessions.  The manager is thread-safe, evicts
+sessions that have been idle longer than ``idle_timeout`` and, when a memory
+budget is given, evicts the least recently used sessions to stay within it.
+"""
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+
+class PatientSession:
+    __slots__ = ('session_id', 'symptoms', 'flow', 'node', 'qa_symptoms', 'last_seen')
+
+    def __init__(self, session_id, now):
+        self.session_id = session_id
+        self.symptoms = 0
+        # Question flow of the Q&A walk, set when the walk starts
+        self.flow = None
+        self.node = 0
+        self.qa_symptoms = 0
+        self.last_seen = now
+
+
+def _bit_indices(bits):
+    """Indices of the set bits of an int, lowest first"""
+    indices = []
+    while bits:
+        lowest = bits & -bits
+        indices.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return indices
+
+
+class SessionManager:
+    def __init__(self, engine, idle_timeout=DEFAULT_IDLE_TIMEOUT, memory_budget=None,
+                 clock=time.monotonic):
+        """Hold sessions diagnosed by an engine
+
+        ``engine`` is a DiagnosisEngine, or a function returning the current
+        one.  ``idle_timeout`` None keeps idle sessions until they are
+        expired; ``memory_budget`` is an approximate limit in bytes for all
+        sessions.
+        """
+        self._engine = engine if callable(engine) else (lambda: engine)
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+        self.max_sessions = None
+        if memory_budget is not None:
+            self.max_sessions = max(1, memory_budget // self.session_size())
+
+    @property
+    def engine(self):
+        """The engine sessions are diagnosed with right now"""
+        return self._engine()
+
+    def session_size(self):
+        """Approximate bytes held per idle session, including its index entry"""
+        sample = PatientSession(secrets.token_hex(8), self.clock())
+        # Slots object, its id string, a float timestamp and the OrderedDict entry
+        return (sys.getsizeof(sample) + sys.getsizeof(sample.session_id) +
+                sys.getsizeof(sample.last_seen) + 100)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def estimated_memory(self):
+        """Approximate bytes used by the sessions currently held"""
+        return len(self._sessions) * self.session_size()
+
+    def create(self):
+        """Create a new session and return it"""
+        now = self.clock()
+        with self._lock:
+            self._evict_idle(now)
+            session_id = secrets.token_hex(8)
+            while session_id in self._sessions:
+                session_id = secrets.token_hex(8)
+            session = PatientSession(session_id, now)
+            self._sessions[session_id] = session
+            if self.max_sessions is not None:
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            return session
+
+    def get(self, session_id):
+        """Return a live session and mark it as used, or None if unknown/expired"""
+        now = self.clock()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self.idle_timeout is not None and now - session.last_seen > self.idle_timeout:
+                del self._sessions[session_id]
+                self.evicted += 1
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def expire(self, session_id):
+        """End a session; return True if it existed"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self):
+        """Drop every session idle longer than the timeout; return how many"""
+        with self._lock:
+            return self._evict_idle(self.clock())
+
+    def _evict_idle(self, now):
+        # Sessions are kept in least-recently-used order, so stop at the first live one
+        if self.idle_timeout is None:
+            return 0
+        count = 0
+        sessions = self._sessions
+        while sessions:
+            session = next(iter(sessions.values()))
+            if now - session.last_seen <= self.idle_timeout:
+                break
+            sessions.popitem(last=False)
+            count += 1
+        self.evicted += count
+        return count
+
+    def _require(self, session_id):
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    # Direct symptom input
+
+    def add_symptom(self, session_id, symptom):
+        """Add a known symptom name to a session; return False if unknown"""
+        idx = self.engine.vocabulary.index_of(symptom)
+        if idx is None:
+            return False
+        with self._lock:
+            session = self._require(session_id)
+            session.symptoms |= 1 << idx
+        return True
+
+    def clear_symptoms(self, session_id):
+        with self._lock:
+            self._require(session_id).symptoms = 0
+
+    def symptoms(self, session_id):
+        """Reported symptom names of a session, in column order"""
+        bits = self._require(session_id).symptoms
+        return [self.engine.vocabulary.name_of(idx) for idx in _bit_indices(bits)]
+
+    def analyze(self, session_id, top_k=None):
+        """Diagnose the symptoms reported in a session"""
+        return self.engine.analyze(self.symptoms(session_id), top_k)
+
+    # Traditional Q&A walk
+
+    def _flow(self, session):
+        if session.flow is None:
+            session.flow = self.engine.flow
+        return session.flow
+
+    def question(self, session_id):
+        """Current Q&A question of a session, or None once it reached a diagnosis"""
+        with self._lock:
+            session = self._require(session_id)
+            return self._flow(session).question(session.node)
+
+    def answer(self, session_id, yes):
+        """Answer the current Q&A question of a session"""
+        with self._lock:
+            session = self._require(session_id)
+            flow = self._flow(session)
+            symptom = flow.question(session.node)
+            if symptom is None:
+                return
+            if yes:
+                session.qa_symptoms |= 1 << self.engine.vocabulary.index_of(symptom)
+            session.node = flow.next_node(session.node, yes)
+
+    def qa_symptoms(self, session_id):
+        """Symptom names answered "yes" in a session's Q&A walk, in column order"""
+        bits = self._require(session_id).qa_symptoms
+        return [self.engine.vocabulary.name_of(idx) for idx in _bit_indices(bits)]
+
+    def qa_result(self, session_id):
+        """Diagnosis at the end of a session's Q&A walk, or None if still asking"""
+        with self._lock:
+            session = self._require(session_id)
+            flow = self._flow(session)
+            if flow.question(session.node) is not None:
+                return None
+            disease = flow.leaf_disease(session.node)
+        return self.engine.result_for(disease, self.qa_symptoms(session_id))
+
+    def restart_qa(self, session_id):
+        """Start a session's Q&A walk again, on the current question flow"""
+        with self._lock:
+            session = self._require(session_id)
+            session.flow = None
+            session.node = 0
+            session.qa_symptoms = 0
@@ -0,0 +1,51 @@
+"""Sparse (CSR) 0/1 symptom matrices.
+
+A patient reports a handful of symptoms out of a vocabulary that may grow to
+thousands of symptoms and lab findings, so patient rows and the training matrix
+are kept as scipy CSR matrices: memory and the work done per row follow the
+number of reported symptoms, not the vocabulary size.  Per-disease tables
+(profiles, symptom counts) stay dense, since they have one row per disease.
+"""
+import numpy as np
+from scipy import sparse
+
+
+def csr_rows(index_lists, n_columns):
+    """CSR matrix with a 1 at each listed column index, one row per list"""
+    lengths = np.fromiter((len(indices) for indices in index_lists), dtype=np.int64, count=len(index_lists))
+    indptr = np.zeros(len(index_lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter((idx for indices in index_lists for idx in indices), dtype=np.int32,
+                          count=int(indptr[-1]))
+    X = sparse.csr_matrix((np.ones(len(indices), dtype=np.uint8), indices, indptr),
+                          shape=(len(index_lists), n_columns))
+    X.sum_duplicates()
+    X.data[:] = 1
+    return X
+
+
+def as_csr(X):
+    """0/1 CSR copy of a dense or sparse matrix, with sorted column indices"""
+    X = sparse.csr_matrix(X, dtype=np.uint8, copy=True)
+    X.eliminate_zeros()
+    X.sort_indices()
+    X.data[:] = 1
+    return X
+
+
+def row_positives(X, row):
+    """Column indices of the 1s in a row of a CSR matrix"""
+    return X.indices[X.indptr[row]:X.indptr[row + 1]]
+
+
+def row_lengths(X):
+    """Number of 1s in each row of a CSR matrix"""
+    return np.diff(X.indptr)
+
+
+def label_sums(X, y, n_classes):
+    """(classes x columns) sum of the rows of X with each label, in O(nonzeros)"""
+    y = np.asarray(y, dtype=np.intp)
+    onehot = sparse.csr_matrix((np.ones(len(y), dtype=np.int64), (y, np.arange(len(y)))),
+                               shape=(n_classes, len(y)))
+    return (onehot @ sparse.csr_matrix(X, dtype=np.int64)).toarray()
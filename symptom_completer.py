@@ -0,0 +1,66 @@
+"""Prefix trie for type-ahead symptom suggestions.
+
+Every symptom name and alias is inserted once per word it contains, so typing
+"rash" finds skin_rash as well as names starting with "rash".  Each trie node
+keeps its best completions precomputed, so a lookup only walks the typed
+characters and stays far below one Tk frame.
+"""
+import re
+
+_SEPARATORS = re.compile(r'[\s_]+')
+
+
+def normalize(text):
+    """Lower-case a symptom or query and collapse spaces/underscores to '_'"""
+    return _SEPARATORS.sub('_', text.strip().lower())
+
+
+class _Node:
+    __slots__ = ('children', 'best')
+
+    def __init__(self):
+        self.children = {}
+        self.best = []
+
+
+class SymptomCompleter:
+    def __init__(self, symptoms, aliases=None, limit=8):
+        """Index symptom names and optional {alias: symptom} pairs
+
+        ``limit`` is the maximum number of suggestions kept per prefix.
+        """
+        known = set(symptoms)
+        entries = [(symptom, symptom) for symptom in symptoms]
+        entries += [(alias, symptom) for alias, symptom in (aliases or {}).items()
+                    if symptom in known]
+
+        self.limit = limit
+        self._root = _Node()
+
+        # Shorter keys first so the most specific completions rank highest
+        keys = []
+        for term, symptom in entries:
+            key = normalize(term)
+            words = key.split('_')
+            for start in range(len(words)):
+                keys.append(('_'.join(words[start:]), start, key, symptom))
+        keys.sort(key=lambda entry: (entry[1], len(entry[2]), entry[2]))
+
+        for suffix, _, _, symptom in keys:
+            node = self._root
+            for char in suffix:
+                node = node.children.setdefault(char, _Node())
+                if len(node.best) < limit and symptom not in node.best:
+                    node.best.append(symptom)
+
+    def complete(self, text, n=None):
+        """Return up to n symptom names matching the typed text"""
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.best[:n or self.limit]
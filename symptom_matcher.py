@@ -0,0 +1,202 @@
+"""Indexed fuzzy matching of free-text symptoms to symptom names.
+
+Replaces a full ``difflib.get_close_matches`` pass over every symptom with a
+per-character index of terms sorted by length.  The length ratio alone bounds
+the score, so only one slice of terms is looked at; one vectorized pass over
+it computes the multiset character overlap with the query, which is exactly
+``SequenceMatcher.quick_ratio``, and a second one the bit-parallel longest
+common subsequence of the terms that pass, a tighter bound of ``ratio``.
+Terms are then scored highest bound first, and the scan stops once no
+remaining bound can beat the n-th best symptom, so the results are the same
+as a full ``get_close_matches``-style scan.  Lay-term aliases
+(e.g. "tummy ache" -> stomach_pain) can be loaded from symptom_aliases.csv.
+"""
+import csv
+import os
+from collections import Counter
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from profile_scoring import popcount
+
+ALIASES_CSV = 'symptom_aliases.csv'
+
+# Longer terms get no position bitmask (one 64-bit word per term), so their
+# bound stays the quick_ratio one
+POSITION_BITS = 64
+
+
+def load_aliases(path=ALIASES_CSV):
+    """Read ``alias,symptom`` rows from a CSV file, or return {} if it is missing"""
+    if not os.path.exists(path):
+        return {}
+    aliases = {}
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2 and row[0].strip() and not row[0].startswith('#'):
+                aliases[row[0].strip()] = row[1].strip()
+    return aliases
+
+
+def _positions(text):
+    """Bitmask of the positions of each character of a string"""
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+class SymptomMatcher:
+    def __init__(self, symptoms, aliases=None):
+        """Index symptom names and optional {alias: symptom} pairs"""
+        known = set(symptoms)
+        terms = list(symptoms)
+        targets = list(symptoms)
+        for alias, symptom in (aliases or {}).items():
+            if symptom in known and alias not in known:
+                terms.append(alias)
+                targets.append(symptom)
+
+        # Sorted by length, so the terms of the lengths a query allows are one slice
+        order = sorted(range(len(terms)), key=lambda term_id: len(terms[term_id]))
+        terms = self.terms = [terms[term_id] for term_id in order]
+        self.targets = [targets[term_id] for term_id in order]
+        self._lengths = np.array([len(term) for term in terms], dtype=np.int64)
+        self._length_values, starts = np.unique(self._lengths, return_index=True)
+        self._length_starts = np.append(starts, len(terms))
+
+        # Per character, its count in every term; the multiset intersection
+        # with a query is what SequenceMatcher.quick_ratio measures.  Counts
+        # (and the overlap) never exceed a term's length, so bytes usually do
+        dtype = np.uint8 if self._lengths.max(initial=0) <= 255 else np.int64
+        columns = {}
+        for term_id, term in enumerate(terms):
+            for char, count in Counter(term).items():
+                column = columns.get(char)
+                if column is None:
+                    column = columns[char] = np.zeros(len(terms), dtype=dtype)
+                column[term_id] = count
+        self._char_counts = columns
+        # Most query characters occur once, and then only presence counts
+        self._char_presence = {char: np.minimum(column, 1) for char, column in columns.items()}
+        self._count_dtype = dtype
+        self._count_limit = np.iinfo(dtype).max
+
+        # Per character, the bitmask of its positions in every term, for the
+        # longest common subsequence with a query
+        positions = {}
+        for term_id, term in enumerate(terms):
+            if len(term) > POSITION_BITS:
+                continue
+            for char, mask in _positions(term).items():
+                column = positions.get(char)
+                if column is None:
+                    column = positions[char] = np.zeros(len(terms), dtype=np.uint64)
+                column[term_id] = mask
+        self._char_positions = positions
+        self._full_masks = np.array([(1 << len(term)) - 1 if len(term) <= POSITION_BITS else 0
+                                     for term in terms], dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _candidates(self, query, cutoff):
+        """Term ids whose upper bound of the exact ratio with the query reaches
+        the cutoff, and those bounds, highest first"""
+        length = len(query)
+        # 2 * min(a, b) / (a + b) bounds quick_ratio; it only grows up to the
+        # query length and then falls, so the lengths it lets through are a slice
+        values = self._length_values
+        totals = values + length
+        allowed = np.flatnonzero(2.0 * np.minimum(values, length) / totals >= cutoff)
+        if not len(allowed):
+            return [], []
+        first, last = allowed[0], allowed[-1] + 1
+        start, stop = self._length_starts[first], self._length_starts[last]
+
+        common = np.zeros(stop - start, dtype=self._count_dtype)
+        for char, count in Counter(query).items():
+            if count == 1:
+                column = self._char_presence.get(char)
+                if column is not None:
+                    common += column[start:stop]
+            else:
+                column = self._char_counts.get(char)
+                if column is not None:
+                    common += np.minimum(column[start:stop], min(count, self._count_limit))
+        # Whole-character lower bound of the overlap each length needs, so the
+        # float ratios below are only computed for the terms that can pass
+        needed = np.floor(cutoff * totals[first:last] / 2.0).clip(max=self._count_limit)
+        needed = np.repeat(needed.astype(common.dtype), np.diff(self._length_starts[first:last + 1]))
+        candidates = np.flatnonzero(common >= needed)
+        common = common[candidates]
+        candidates += start
+        lengths = self._lengths[candidates]
+
+        # The matching blocks behind ratio() are a common subsequence, so the
+        # longest one is a tighter bound; computed bit-parallel for all of them.
+        # Carries past a term's length never reach its own bits, so they are
+        # only masked off at the end
+        full = self._full_masks[candidates]
+        v = full
+        for char in query:
+            column = self._char_positions.get(char)
+            if column is not None:
+                u = v & column[candidates]
+                v = (v + u) | (v - u)
+        lcs = lengths - popcount(v & full)
+        # Computed exactly as difflib does, so the cutoff compares the same floats
+        bounds = 2.0 * np.minimum(common, lcs) / (lengths + length)
+        keep = np.flatnonzero(bounds >= cutoff)
+        keep = keep[np.argsort(-bounds[keep], kind='stable')]
+        return candidates[keep].tolist(), bounds[keep].tolist()
+
+    def match(self, query, n=3, cutoff=0.6):
+        """Return up to n (symptom, score) pairs with score >= cutoff, best first
+
+        Raises ValueError unless n > 0 and 0 <= cutoff <= 1, as
+        difflib.get_close_matches does.
+        """
+        if not n > 0:
+            raise ValueError(f"n must be > 0: {n!r}")
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError(f"cutoff must be in [0.0, 1.0]: {cutoff!r}")
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        best = {}
+        threshold = cutoff
+        for term_id, bound in zip(*self._candidates(query, cutoff)):
+            # No remaining term can beat the n-th best symptom found so far
+            if bound < threshold:
+                break
+            symptom = self.targets[term_id]
+            # Nor can this term beat the best alias of its own symptom
+            if bound < best.get(symptom, -1.0):
+                continue
+            matcher.set_seq1(self.terms[term_id])
+            score = matcher.ratio()
+            if score >= cutoff:
+                scored.append((score, self.terms[term_id], symptom))
+                if score > best.get(symptom, -1.0):
+                    best[symptom] = score
+                    if len(best) >= n:
+                        threshold = max(cutoff, sorted(best.values(), reverse=True)[n - 1])
+
+        # Order like get_close_matches, keeping the best term per symptom
+        scored.sort(reverse=True)
+        results = []
+        seen = set()
+        for score, term, symptom in scored:
+            if symptom not in seen:
+                seen.add(symptom)
+                results.append((symptom, score))
+                if len(results) == n:
+                    break
+        return results
+
+    def best(self, query, cutoff=0.6):
+        """Return the single best matching symptom, or None"""
+        matches = self.match(query, n=1, cutoff=cutoff)
+        return matches[0][0] if matches else None
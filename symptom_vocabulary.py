@@ -0,0 +1,77 @@
+"""Immutable symptom vocabulary built once when the model is loaded.
+
+Replaces the repeated ``all_symptoms.index`` scans and per-call profile
+rebuilding with hash lookups and precomputed per-disease index sets, so that
+encoding and explaining cost O(k) in the number of reported symptoms.
+"""
+from types import MappingProxyType
+
+
+class SymptomVocabulary:
+    __slots__ = ('symptoms', 'diseases', '_symptom_index', '_disease_index',
+                 '_profile_indices', '_profile_names')
+
+    def __init__(self, symptoms, diseases, profiles):
+        """Build the vocabulary from symptom names, disease names and 0/1 profiles
+
+        ``profiles`` holds one row per disease with one 0/1 flag per symptom.
+        """
+        symptoms = tuple(str(symptom) for symptom in symptoms)
+        diseases = tuple(str(disease) for disease in diseases)
+
+        profile_indices = []
+        profile_names = []
+        for row in profiles:
+            indices = tuple(idx for idx, val in enumerate(row) if val == 1)
+            profile_indices.append(frozenset(indices))
+            profile_names.append(tuple(symptoms[idx] for idx in indices))
+
+        set_ = object.__setattr__
+        set_(self, 'symptoms', symptoms)
+        set_(self, 'diseases', diseases)
+        set_(self, '_symptom_index', MappingProxyType({name: idx for idx, name in enumerate(symptoms)}))
+        set_(self, '_disease_index', MappingProxyType({name: idx for idx, name in enumerate(diseases)}))
+        set_(self, '_profile_indices', tuple(profile_indices))
+        set_(self, '_profile_names', tuple(profile_names))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SymptomVocabulary is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("SymptomVocabulary is immutable")
+
+    def __len__(self):
+        return len(self.symptoms)
+
+    def __contains__(self, symptom):
+        return symptom in self._symptom_index
+
+    @property
+    def symptom_index(self):
+        """Read-only name -> column index mapping"""
+        return self._symptom_index
+
+    def index_of(self, symptom):
+        """Return the column index of a symptom name, or None if unknown"""
+        return self._symptom_index.get(symptom)
+
+    def name_of(self, idx):
+        """Return the symptom name for a column index"""
+        return self.symptoms[idx]
+
+    def encode(self, symptoms):
+        """Return the sorted, de-duplicated column indices of the known symptoms"""
+        index = self._symptom_index
+        return tuple(sorted({index[symptom] for symptom in symptoms if symptom in index}))
+
+    def disease_id(self, disease):
+        """Return the row of a disease in the profile table, or None if unknown"""
+        return self._disease_index.get(str(disease))
+
+    def disease_symptoms(self, disease_id):
+        """Frozen set of the symptom indices associated with a disease row"""
+        return self._profile_indices[disease_id]
+
+    def disease_symptom_names(self, disease_id):
+        """Symptom names associated with a disease row, in column order"""
+        return self._profile_names[disease_id]
@@ -0,0 +1,117 @@
+"""SymptomMatcher must give exactly the results of a full difflib scan."""
+import csv
+import os
+import random
+from difflib import SequenceMatcher, get_close_matches
+
+import pytest
+
+from symptom_matcher import SymptomMatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LETTERS = 'abcdefghijklmnopqrstuvwxyz _'
+SETTINGS = ((1, 0.6), (3, 0.6), (5, 0.4), (3, 1.0))
+LOWEST_CUTOFF = min(cutoff for _, cutoff in SETTINGS)
+
+
+def _symptoms():
+    with open(os.path.join(HERE, 'Training.csv'), newline='', encoding='utf-8') as file:
+        header = next(csv.reader(file))
+    return list(dict.fromkeys(column.strip() for column in header if column != 'prognosis'))
+
+
+def _full_scan(terms, targets, query, cutoff):
+    """Score every term like get_close_matches, best first"""
+    matcher = SequenceMatcher()
+    matcher.set_seq2(query)
+    scored = []
+    for term, symptom in zip(terms, targets):
+        matcher.set_seq1(term)
+        if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff \
+                and matcher.ratio() >= cutoff:
+            scored.append((matcher.ratio(), term, symptom))
+    scored.sort(reverse=True)
+    return scored
+
+
+def _best(scored, n, cutoff):
+    """The n best symptoms of a full scan, keeping the best term of each"""
+    results = []
+    seen = set()
+    for score, term, symptom in scored:
+        if score >= cutoff and symptom not in seen:
+            seen.add(symptom)
+            results.append((symptom, score))
+            if len(results) == n:
+                break
+    return results
+
+
+def _typo(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(chars))
+        edit = rng.randrange(3)
+        if edit == 0:
+            chars[position] = rng.choice(LETTERS)
+        elif edit == 1 and len(chars) > 1:
+            del chars[position]
+        else:
+            chars.insert(position, rng.choice(LETTERS))
+    return ''.join(chars)
+
+
+def _queries(rng, terms, count):
+    queries = ['', 'x', 'aaaaaaaa', 'tummy ache', 'skin rash', 'itching ' * 10]
+    while len(queries) < count:
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(rng.choice(terms))
+        elif kind == 1:
+            queries.append(''.join(rng.choice(LETTERS) for _ in range(rng.randint(1, 20))))
+        else:
+            queries.append(_typo(rng, rng.choice(terms)))
+    return queries
+
+
+def test_symptom_names_match_get_close_matches():
+    symptoms = _symptoms()
+    matcher = SymptomMatcher(symptoms)
+    rng = random.Random(0)
+    for query in _queries(rng, symptoms, 1000):
+        scored = _full_scan(symptoms, symptoms, query, LOWEST_CUTOFF)
+        for n, cutoff in SETTINGS:
+            expected = get_close_matches(query, symptoms, n=n, cutoff=cutoff)
+            assert [symptom for symptom, _ in matcher.match(query, n, cutoff)] == expected, query
+            assert matcher.match(query, n, cutoff) == _best(scored, n, cutoff), query
+
+
+def test_aliases_match_full_scan():
+    symptoms = _symptoms()
+    rng = random.Random(1)
+    words = sorted({word for symptom in symptoms for word in symptom.split('_') if word})
+    aliases = {}
+    while len(aliases) < 400:
+        aliases[' '.join(rng.sample(words, rng.randint(1, 3)))] = rng.choice(symptoms)
+    # Longer than one 64-bit position mask
+    aliases[' '.join(words[:12])] = symptoms[0]
+    matcher = SymptomMatcher(symptoms, aliases)
+    for query in _queries(rng, matcher.terms, 2000):
+        scored = _full_scan(matcher.terms, matcher.targets, query, LOWEST_CUTOFF)
+        for n, cutoff in SETTINGS:
+            assert matcher.match(query, n, cutoff) == _best(scored, n, cutoff), (query, n, cutoff)
+
+
+def test_zero_cutoff_scores_every_term():
+    symptoms = _symptoms()
+    matcher = SymptomMatcher(symptoms, {'tummy ache': 'stomach_pain'})
+    for query in _queries(random.Random(2), matcher.terms, 50):
+        scored = _full_scan(matcher.terms, matcher.targets, query, 0.0)
+        assert matcher.match(query, 5, 0.0) == _best(scored, 5, 0.0), query
+
+
+@pytest.mark.parametrize('n, cutoff', [(0, 0.6), (-1, 0.6), (3, -0.1), (3, 1.5)])
+def test_rejects_out_of_range_arguments(n, cutoff):
+    matcher = SymptomMatcher(['cough', 'chills'])
+    with pytest.raises(ValueError):
+        matcher.match('cogh', n, cutoff)
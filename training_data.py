@@ -0,0 +1,132 @@
+"""Compact binary storage for Training.csv with memory-mapped loading.
+
+The 0/1 symptom flags are stored in CSR form (row pointers and the column
+index of every present symptom, as ``.npy`` arrays) and the prognosis column
+as small integer codes into a label table, so loading is a zero-copy
+``np.load(mmap_mode='r')`` instead of parsing the CSV text, and the size grows
+with the number of present symptoms rather than rows x vocabulary.  The binary
+copy is keyed by the CSV content hash and regenerated when the CSV changes.
+
+Run ``python training_data.py [Training.csv]`` to convert ahead of time.
+"""
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+from scipy import sparse
+
+from model_artifact import TRAINING_CSV, data_hash
+from sparse_symptoms import label_sums
+
+FORMAT_VERSION = 2
+
+
+def _paths(csv_path):
+    """Return the (row pointers, column indices, labels, meta) file paths for a CSV file"""
+    stem = os.path.splitext(csv_path)[0]
+    return stem + '.indptr.npy', stem + '.indices.npy', stem + '.labels.npy', stem + '.meta.json'
+
+
+class TrainingData:
+    def __init__(self, symptoms, labels, columns, label_names):
+        """``symptoms`` is a (rows x columns) 0/1 CSR matrix"""
+        self.symptoms = symptoms
+        self.labels = labels
+        self.columns = columns
+        self.label_names = label_names
+
+    def __len__(self):
+        return len(self.labels)
+
+    def profiles(self):
+        """Per-disease symptom profile (1 where any of the disease's rows has the symptom)"""
+        counts, _ = self.symptom_counts()
+        return (counts > 0).astype(np.uint8)
+
+    def symptom_counts(self):
+        """Per-disease symptom counts and the number of rows of each disease"""
+        counts = label_sums(self.symptoms, self.labels, len(self.label_names))
+        totals = np.bincount(self.labels, minlength=len(self.label_names))
+        return counts, totals
+
+
+def convert(csv_path=TRAINING_CSV):
+    """Convert a symptom CSV to the binary format and return its TrainingData"""
+    indptr_path, indices_path, labels_path, meta_path = _paths(csv_path)
+
+    # One pass, keeping only the column indices of the present symptoms
+    indptr = [0]
+    indices = []
+    raw_labels = []
+    with open(csv_path, newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        columns = header[:-1]
+        for row in reader:
+            if not row:
+                continue
+            present = np.flatnonzero(np.array(row[:len(columns)], dtype=np.uint8)).astype(np.int32)
+            indices.append(present)
+            indptr.append(indptr[-1] + len(present))
+            raw_labels.append(row[len(columns)])
+    np.save(indptr_path + '.tmp.npy', np.array(indptr, dtype=np.int64))
+    np.save(indices_path + '.tmp.npy', np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32))
+
+    # Sorted label table, matching LabelEncoder's class order
+    label_names = sorted(set(raw_labels))
+    code_of = {name: code for code, name in enumerate(label_names)}
+    dtype = np.uint8 if len(label_names) <= 256 else np.uint16
+    labels = np.array([code_of[name] for name in raw_labels], dtype=dtype)
+    np.save(labels_path + '.tmp.npy', labels)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "data_hash": data_hash([csv_path]),
+        "columns": columns,
+        "label_names": label_names,
+    }
+    with open(meta_path + '.tmp', 'w') as file:
+        json.dump(meta, file)
+
+    os.replace(indptr_path + '.tmp.npy', indptr_path)
+    os.replace(indices_path + '.tmp.npy', indices_path)
+    os.replace(labels_path + '.tmp.npy', labels_path)
+    os.replace(meta_path + '.tmp', meta_path)
+    return load(csv_path)
+
+
+def load(csv_path=TRAINING_CSV):
+    """Memory-map the binary copy of a CSV, or return None if missing or stale"""
+    paths = _paths(csv_path)
+    indptr_path, indices_path, labels_path, meta_path = paths
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    with open(meta_path) as file:
+        meta = json.load(file)
+    if meta.get("version") != FORMAT_VERSION:
+        return None
+    if meta.get("data_hash") != data_hash([csv_path]):
+        return None
+    indptr = np.load(indptr_path, mmap_mode='r')
+    indices = np.load(indices_path, mmap_mode='r')
+    symptoms = sparse.csr_matrix((np.ones(len(indices), dtype=np.uint8), indices, indptr),
+                                 shape=(len(indptr) - 1, len(meta["columns"])))
+    return TrainingData(symptoms, np.load(labels_path, mmap_mode='r'),
+                        meta["columns"], meta["label_names"])
+
+
+def load_or_convert(csv_path=TRAINING_CSV):
+    """Return the memory-mapped training data, converting the CSV if needed"""
+    data = load(csv_path)
+    if data is None:
+        data = convert(csv_path)
+    return data
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else TRAINING_CSV
+    data = convert(path)
+    print(f"Converted {path}: {len(data)} rows x {len(data.columns)} symptoms, "
+          f"{data.symptoms.nnz} present, {len(data.label_names)} diseases")
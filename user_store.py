@@ -0,0 +1,197 @@
+"""Indexed credential store backed by an embedded SQLite database.
+
+Replaces the one-plaintext-file-per-user scheme, where every login and signup
+listed the whole working directory.  Lookups go through the primary-key index,
+registration is a single atomic INSERT, and passwords are stored as salted
+PBKDF2-HMAC-SHA256 hashes with a tunable iteration count.  Hashes made with
+an older iteration count are upgraded on the next successful login.
+
+The old per-user files are imported on a background thread, so a large user
+base does not delay start-up; a user who logs in before the import reaches
+their file is imported on the spot.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+
+USERS_DB = 'users.db'
+
+# PBKDF2 work factor for new and upgraded hashes
+DEFAULT_ITERATIONS = 200_000
+SALT_BYTES = 16
+
+# Largest file considered when looking for legacy per-user account files
+LEGACY_MAX_BYTES = 4096
+
+AUTH_OK = "ok"
+AUTH_UNKNOWN_USER = "unknown_user"
+AUTH_BAD_PASSWORD = "bad_password"
+
+log = logging.getLogger(__name__)
+
+
+def read_legacy_user(path):
+    """(username, password) if path is an old per-user account file, else None
+
+    Those files are recognised by their content: exactly two lines, the
+    username (the file's own name) and the password.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) > LEGACY_MAX_BYTES:
+        return None
+    try:
+        with open(path, 'r') as file:
+            lines = file.read().splitlines()
+    except UnicodeDecodeError:
+        return None
+    if len(lines) != 2 or not lines[1] or lines[0] != os.path.basename(path):
+        return None
+    return lines[0], lines[1]
+
+
+def hash_password(password, salt, iterations):
+    """Return the PBKDF2-HMAC-SHA256 hash of a password"""
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+class UserStore:
+    def __init__(self, path=USERS_DB, iterations=DEFAULT_ITERATIONS, legacy_directory='.'):
+        self.path = path
+        self.iterations = iterations
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " username TEXT PRIMARY KEY,"
+            " salt BLOB NOT NULL,"
+            " hash BLOB NOT NULL,"
+            " iterations INTEGER NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # Old per-user files are imported until the migration has completed once
+        self.legacy_directory = legacy_directory
+        done = self._db.execute("SELECT value FROM meta WHERE key = 'legacy_migrated'").fetchone()
+        self._legacy_pending = done is None
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def exists(self, username):
+        """Return True if the username is registered"""
+        self._import_pending(username)
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
+        return row is not None
+
+    def register(self, username, password):
+        """Register a new user; return False if the username is taken"""
+        self._import_pending(username)
+        return self._insert(username, password)
+
+    def _insert(self, username, password):
+        salt = os.urandom(SALT_BYTES)
+        digest = hash_password(password, salt, self.iterations)
+        try:
+            with self._lock:
+                self._db.execute("INSERT INTO users VALUES (?, ?, ?, ?)",
+                                 (username, salt, digest, self.iterations))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def authenticate(self, username, password):
+        """Check a login and return AUTH_OK, AUTH_UNKNOWN_USER or AUTH_BAD_PASSWORD"""
+        self._import_pending(username)
+        with self._lock:
+            row = self._db.execute("SELECT salt, hash, iterations FROM users WHERE username = ?",
+                                   (username,)).fetchone()
+        if row is None:
+            return AUTH_UNKNOWN_USER
+
+        salt, digest, iterations = row
+        if not hmac.compare_digest(hash_password(password, salt, iterations), digest):
+            return AUTH_BAD_PASSWORD
+
+        if iterations != self.iterations:
+            # Re-hash with the current work factor while we know the password
+            salt = os.urandom(SALT_BYTES)
+            with self._lock:
+                self._db.execute("UPDATE users SET salt = ?, hash = ?, iterations = ? WHERE username = ?",
+                                 (salt, hash_password(password, salt, self.iterations),
+                                  self.iterations, username))
+        return AUTH_OK
+
+    # Legacy accounts: one plaintext file per user in the working directory
+
+    def _import_pending(self, username):
+        """Import the legacy file of a user the migration has not reached yet"""
+        if not self._legacy_pending or not username or os.path.basename(username) != username:
+            return
+        path = os.path.join(self.legacy_directory, username)
+        try:
+            account = read_legacy_user(path)
+            if account is not None:
+                self._import_legacy(path, *account)
+        except (OSError, sqlite3.Error) as e:
+            log.warning("Could not import legacy user file %s: %s", path, e)
+
+    def _import_legacy(self, path, username, password):
+        """Store a legacy account and delete its file; an existing account is kept"""
+        self._insert(username, password)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def migrate_legacy_users(self):
+        """Import every old per-user plaintext file and delete it
+
+        Each account costs one full password hash, so with many users this
+        belongs on a background thread (start_legacy_migration); until a
+        file is reached, logging in or registering with its username imports
+        it on demand.  Files that cannot be imported are logged and retried
+        on the next run; the store is only marked as migrated once none are
+        left.  Returns the number imported.
+        """
+        if not self._legacy_pending:
+            return 0
+        try:
+            names = os.listdir(self.legacy_directory)
+        except OSError as e:
+            log.warning("Could not list %s for legacy user files: %s", self.legacy_directory, e)
+            return 0
+
+        imported = failed = 0
+        for name in names:
+            path = os.path.join(self.legacy_directory, name)
+            try:
+                account = read_legacy_user(path)
+                if account is None:
+                    continue
+                self._import_legacy(path, *account)
+                imported += 1
+            except (OSError, sqlite3.Error) as e:
+                failed += 1
+                log.warning("Could not import legacy user file %s: %s", path, e)
+
+        if not failed:
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_migrated', '1')")
+            self._legacy_pending = False
+        return imported
+
+    def start_legacy_migration(self):
+        """Run migrate_legacy_users on a daemon thread; None if already migrated"""
+        if not self._legacy_pending:
+            return None
+        thread = threading.Thread(target=self.migrate_legacy_users, name="user-migration", daemon=True)
+        thread.start()
+        return thread